@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Month-over-month diff of two role catalogs.
+
+Both catalogs are walked once, in role-name order (a sorted merge), so the
+comparison is linear in the catalog size:
+- Roles whose `etag` did not change are skipped without looking at them.
+- For changed roles, sorted permission lists are merged to find the added and
+  removed permissions, and metadata changes (stage, title, description) are
+  recorded.
+
+The delta is a compact JSON document:
+
+    {
+      "previous": "...", "current": "...",
+      "summary": {"added": 1, "removed": 0, "changed": 2, "unchanged": 1800},
+      "added": [<full role>, ...],
+      "removed": ["roles/...", ...],
+      "changed": [{"name": "roles/...", "etag": "...",
+                   "permissionsAdded": [...], "permissionsRemoved": [...],
+                   "services": [...],
+                   "stage": {"from": "BETA", "to": "GA"}}, ...]
+    }
+
+Usage:
+    python catalog_diff.py previous.json current.json -o roles_delta.json
+"""
+
+import argparse
+import json
+
+from role_writer import iter_catalog
+
+DEFAULT_DELTA_FILE = "roles_delta.json"
+TRACKED_FIELDS = ("stage", "title", "description")
+
+
+def _ordered(roles, label):
+    """Yield roles while checking they come in strictly increasing name order."""
+    previous = None
+    for role in roles:
+        name = role["name"]
+        if previous is not None and name <= previous:
+            raise ValueError(f"{label} is not sorted by role name ({previous} before {name})")
+        previous = name
+        yield role
+
+
+def _tee(roles, on_role):
+    """Yield roles, handing each one to on_role first."""
+    for role in roles:
+        on_role(role)
+        yield role
+
+
+def _diff_sorted(old, new):
+    """Merge two sorted lists and return (added, removed)."""
+    added, removed = [], []
+    i = j = 0
+    while i < len(old) and j < len(new):
+        if old[i] == new[j]:
+            i += 1
+            j += 1
+        elif old[i] < new[j]:
+            removed.append(old[i])
+            i += 1
+        else:
+            added.append(new[j])
+            j += 1
+    removed.extend(old[i:])
+    added.extend(new[j:])
+    return added, removed
+
+
+def diff_role(previous, current):
+    """Return the change record for one role, or None if nothing changed."""
+    if previous.get("etag") and previous.get("etag") == current.get("etag"):
+        return None
+
+    added, removed = _diff_sorted(
+        sorted(previous.get("includedPermissions", [])),
+        sorted(current.get("includedPermissions", [])),
+    )
+    change = {"name": current["name"], "etag": current.get("etag")}
+    if added:
+        change["permissionsAdded"] = added
+    if removed:
+        change["permissionsRemoved"] = removed
+    if previous.get("services") != current.get("services"):
+        change["services"] = current.get("services", [])
+    for field in TRACKED_FIELDS:
+        if previous.get(field) != current.get(field):
+            change[field] = {"from": previous.get(field), "to": current.get(field)}
+
+    return change if len(change) > 2 else None
+
+
+def diff_catalogs(previous_roles, current_roles):
+    """Diff two iterables of role dicts, both sorted by role name."""
+    delta = {"added": [], "removed": [], "changed": []}
+    unchanged = 0
+
+    previous_iter = _ordered(previous_roles, "previous catalog")
+    current_iter = _ordered(current_roles, "current catalog")
+    old = next(previous_iter, None)
+    new = next(current_iter, None)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old["name"] < new["name"]):
+            delta["removed"].append(old["name"])
+            old = next(previous_iter, None)
+        elif old is None or new["name"] < old["name"]:
+            delta["added"].append(new)
+            new = next(current_iter, None)
+        else:
+            change = diff_role(old, new)
+            if change:
+                delta["changed"].append(change)
+            else:
+                unchanged += 1
+            old = next(previous_iter, None)
+            new = next(current_iter, None)
+
+    delta["summary"] = {
+        "added": len(delta["added"]),
+        "removed": len(delta["removed"]),
+        "changed": len(delta["changed"]),
+        "unchanged": unchanged,
+    }
+    return delta
+
+
+def diff_catalog_files(previous_path, current_path, delta_path=DEFAULT_DELTA_FILE, on_current=None):
+    """Diff two catalog files (any format supported by role_writer) into a delta file.
+
+    Both files are streamed. Each role of the current catalog is also handed
+    to on_current, if given, so callers can reuse this pass over the file.
+    Returns the delta summary.
+    """
+    current_roles = iter_catalog(current_path, sort=True)
+    if on_current:
+        current_roles = _tee(current_roles, on_current)
+    delta = diff_catalogs(iter_catalog(previous_path, sort=True), current_roles)
+    document = {"previous": previous_path, "current": current_path, "summary": delta.pop("summary")}
+    document.update(delta)
+    with open(delta_path, "w") as f:
+        json.dump(document, f, separators=(",", ":"))
+    return document["summary"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff two IAM role catalogs")
+    parser.add_argument("previous", help="Previous catalog file")
+    parser.add_argument("current", help="Current catalog file")
+    parser.add_argument("-o", "--output", default=DEFAULT_DELTA_FILE, help="Delta file to write")
+    args = parser.parse_args()
+
+    summary = diff_catalog_files(args.previous, args.current, args.output)
+    print(f"{summary['added']} added, {summary['removed']} removed, {summary['changed']} changed, "
+          f"{summary['unchanged']} unchanged → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+"""
+Asyncio fetch engine used by the IAM roles scraper.
+
+Requests go through the existing (blocking) authorized session on a worker
+thread pool, while an asyncio loop decides how many of them run at once:
+- Concurrency grows (slow start, then additively) while request latency stays
+  flat, and is halved as soon as the API answers 429/503.
+- Throttled and transient failures (429, 5xx, connection errors) are retried
+  with full-jitter exponential backoff until they succeed or a hard budget
+  (attempts per request, seconds per run or per request) runs out.
+- Every retried and dropped key is recorded so the run can report them
+  instead of silently losing data.
+"""
+
+import asyncio
+import concurrent.futures
+import random
+import time
+
+import requests
+
+# Engine defaults
+INITIAL_CONCURRENCY = 4
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 64
+LATENCY_TOLERANCE = 1.5  # Latency above baseline * tolerance counts as "not flat"
+MAX_ATTEMPTS = 8  # Attempts per request before it is dropped
+RETRY_BUDGET_SECONDS = 300  # Hard wall-clock budget for the whole run
+REQUEST_BUDGET_SECONDS = 120  # Retry budget of a single request, for runs whose length grows with their size
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 32
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+THROTTLE_STATUS_CODES = {429, 503}
+
+
+class FetchError(Exception):
+    """Raised when a request fails permanently or its retry budget runs out."""
+
+
+class FetchStats:
+    """Counters collected during a run."""
+
+    def __init__(self):
+        self.requests = 0
+        self.throttled = 0
+        self.retried = set()
+        self.dropped = {}
+
+    def summary(self):
+        return {
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "retried": len(self.retried),
+            "dropped": len(self.dropped),
+        }
+
+
+class AdaptiveLimiter:
+    """AIMD concurrency limiter: grows while latency is flat, halves on throttling.
+
+    Like TCP, it starts in slow start (one step per success) until the first
+    throttled response or latency rise, then grows one step per window.
+    """
+
+    def __init__(self, initial=INITIAL_CONCURRENCY, minimum=MIN_CONCURRENCY,
+                 maximum=MAX_CONCURRENCY, tolerance=LATENCY_TOLERANCE):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.tolerance = tolerance
+        self.in_flight = 0
+        self.baseline = None
+        self.peak = initial
+        self.slow_start = True
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._condition:
+            while self.in_flight >= self.limit:
+                await self._condition.wait()
+            self.in_flight += 1
+
+    async def release(self, latency=None, throttled=False):
+        async with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(self.minimum, self.limit // 2)
+                self.slow_start = False
+                self._successes = 0
+            elif latency is not None:
+                self._record_latency(latency)
+            # Wake only as many waiters as there are free slots
+            self._condition.notify(max(0, self.limit - self.in_flight))
+
+    def _record_latency(self, latency):
+        # The baseline follows the fastest observed latency and only drifts up slowly
+        if self.baseline is None or latency < self.baseline:
+            self.baseline = latency
+        else:
+            self.baseline += (latency - self.baseline) * 0.01
+
+        if latency <= self.baseline * self.tolerance:
+            # Slow start doubles the limit every window, then one step per window
+            self._successes += 1
+            if self.slow_start or self._successes >= self.limit:
+                self.limit = min(self.maximum, self.limit + 1)
+                self.peak = max(self.peak, self.limit)
+                self._successes = 0
+        else:
+            self.limit = max(self.minimum, self.limit - 1)
+            self.slow_start = False
+            self._successes = 0
+
+
+class FetchEngine:
+    """Retrying, adaptively concurrent GET engine on top of an authorized session.
+
+    Retries stop at `budget_seconds` after the engine is created (None for no
+    run-wide budget) and, with `request_budget_seconds`, that many seconds
+    after a request's first attempt (time spent waiting for a slot excluded).
+
+    Must be created inside a running event loop.
+    """
+
+    def __init__(self, authed_session, initial_concurrency=INITIAL_CONCURRENCY,
+                 max_concurrency=MAX_CONCURRENCY, max_attempts=MAX_ATTEMPTS,
+                 budget_seconds=RETRY_BUDGET_SECONDS, request_budget_seconds=None):
+        self.authed_session = authed_session
+        self.max_attempts = max_attempts
+        self.deadline = time.monotonic() + budget_seconds if budget_seconds is not None else None
+        self.request_budget_seconds = request_budget_seconds
+        self.limiter = AdaptiveLimiter(initial=initial_concurrency, maximum=max_concurrency)
+        self.stats = FetchStats()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_concurrency)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def _blocking_get(self, url, params):
+        response = self.authed_session.get(url, params=params)
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            return response.status_code, response.headers.get("Retry-After"), None
+        response.raise_for_status()
+        return response.status_code, None, response.json()
+
+    def _request_deadline(self):
+        """Deadline of a request starting now: the earliest of the run and request budgets, or None."""
+        deadlines = [self.deadline]
+        if self.request_budget_seconds is not None:
+            deadlines.append(time.monotonic() + self.request_budget_seconds)
+        deadlines = [deadline for deadline in deadlines if deadline is not None]
+        return min(deadlines) if deadlines else None
+
+    def _backoff(self, attempt, retry_after=None):
+        """Full-jitter exponential backoff, never shorter than a server Retry-After."""
+        delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt - 1)))
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        return delay
+
+    async def get_json(self, url, params=None, key=None):
+        """GET a URL and return its decoded JSON body, retrying transient failures.
+
+        Args:
+            url (str): The URL to fetch.
+            params (dict, optional): Query parameters.
+            key (str, optional): Identifier used in the retried/dropped stats.
+                Defaults to the URL.
+
+        Raises:
+            FetchError: On a non-retryable error or once the retry budget runs out.
+        """
+        key = key or url
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        deadline = None
+
+        while True:
+            attempt += 1
+            await self.limiter.acquire()
+            if attempt == 1:
+                deadline = self._request_deadline()
+            self.stats.requests += 1
+            start = time.monotonic()
+            try:
+                status, retry_after, data = await loop.run_in_executor(
+                    self._executor, self._blocking_get, url, params
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                await self.limiter.release()
+                status, retry_after, data, reason = None, None, None, str(e)
+            except Exception as e:
+                await self.limiter.release()
+                self.stats.dropped[key] = str(e)
+                raise FetchError(f"{key}: {e}") from e
+            else:
+                throttled = status in THROTTLE_STATUS_CODES
+                if data is not None:
+                    await self.limiter.release(latency=time.monotonic() - start)
+                    return data
+                await self.limiter.release(throttled=throttled)
+                if throttled:
+                    self.stats.throttled += 1
+                reason = f"HTTP {status}"
+
+            delay = self._backoff(attempt, retry_after)
+            if attempt >= self.max_attempts or (deadline is not None and time.monotonic() + delay > deadline):
+                self.stats.dropped[key] = reason
+                raise FetchError(f"{key}: gave up after {attempt} attempts ({reason})")
+            self.stats.retried.add(key)
+            await asyncio.sleep(delay)
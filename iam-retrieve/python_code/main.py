@@ -1,39 +1,108 @@
-import json
-import concurrent.futures
+import asyncio
+import os
 from google.oauth2 import service_account
-from google.auth.transport.requests import AuthorizedSession
+from fetch_engine import FetchEngine, FetchError, REQUEST_BUDGET_SECONDS
+from transport import PooledTransport, POOL_SIZE
+from role_index import build_index, DEFAULT_INDEX_FILE
+from role_writer import RoleCatalogWriter, catalog_filename, iter_catalog
+from catalog_diff import diff_catalog_files, DEFAULT_DELTA_FILE
 
 # Path to your service account key file
 SERVICE_ACCOUNT_FILE = "path/to/your-service-account.json"
 SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
 
-def get_authenticated_session():
-    """Authenticate with Google Cloud using a service account."""
+# Role listing configuration
+ROLES_URL = "https://iam.googleapis.com/v1/roles"
+LIST_VIEW = "FULL"  # "FULL" returns includedPermissions, "BASIC" only metadata
+LIST_PAGE_SIZE = 1000  # Maximum page size accepted by the IAM API
+
+# Custom roles scan: set an organization ID to also list the custom roles of the
+# organization and of every active project under it (its folder tree is walked)
+CUSTOM_ROLES_ORG_ID = None  # e.g. "123456789012"
+PROJECTS_SEARCH_URL = "https://cloudresourcemanager.googleapis.com/v3/projects:search"
+PROJECTS_PAGE_SIZE = 500
+FOLDERS_LIST_URL = "https://cloudresourcemanager.googleapis.com/v3/folders"
+FOLDERS_PAGE_SIZE = 500
+
+# Output configuration
+OUTPUT_BASENAME = "roles_with_permissions_and_services"
+OUTPUT_FORMAT = "json"  # "json" (pretty, indent=2) or "ndjson"
+OUTPUT_COMPRESSION = None  # None, "gzip" or "zstd" (requires zstandard)
+PREVIOUS_SUFFIX = ".previous"  # Last run's catalog is kept as <basename>.previous.<format>
+
+def get_authenticated_session(pool_size=POOL_SIZE):
+    """Authenticate with Google Cloud using a service account.
+
+    Returns a pooled transport whose connection pool matches the fetch concurrency.
+    """
     credentials = service_account.Credentials.from_service_account_file(
         SERVICE_ACCOUNT_FILE, scopes=SCOPES
     )
-    return AuthorizedSession(credentials)
-
-def fetch_roles_list(authed_session):
-    """Fetch the list of all IAM roles (paginated)."""
-    url = "https://iam.googleapis.com/v1/roles"
-    roles = []
-    next_token = None
+    return PooledTransport(credentials, pool_size=pool_size)
 
+async def iter_pages(engine, url, params, key, field):
+    """Yield the items of a paged Google API listing, one page at a time, retried through the engine."""
+    params = dict(params)
     while True:
-        full_url = url
-        if next_token:
-            full_url += f"?pageToken={next_token}"
-
-        response = authed_session.get(full_url)
-        response.raise_for_status()
-        data = response.json()
-        print(f"Fetched {len(data.get('roles', []))} roles from current page")
-        roles.extend(data.get("roles", []))
+        data = await engine.get_json(url, params=dict(params), key=key)
+        yield data.get(field, [])
         next_token = data.get("nextPageToken")
         if not next_token:
-            break
-    return roles
+            return
+        params["pageToken"] = next_token
+
+async def iter_roles_pages(engine, view=None, page_size=None):
+    """Yield the IAM roles one listing page at a time.
+
+    With view="FULL" each role already carries its includedPermissions, so the
+    whole catalog comes down in a handful of paged calls. Pages are retried
+    like any other engine request; a page the engine gives up on raises
+    FetchError instead of cutting the catalog short.
+    """
+    params = {}
+    if view:
+        params["view"] = view
+    if page_size:
+        params["pageSize"] = page_size
+
+    async for roles in iter_pages(engine, ROLES_URL, params, "roles list", "roles"):
+        print(f"Fetched {len(roles)} roles from current page")
+        yield roles
+
+async def list_roles(authed_session, on_result, view=None, page_size=None):
+    """List every IAM role through the fetch engine.
+
+    Complete roles are enriched and handed to on_result as their page arrives.
+    Returns (listed role count, names of the roles that need a detail fetch, engine stats).
+    """
+    engine = FetchEngine(authed_session)
+    listed_count = 0
+    incomplete_roles = []
+    try:
+        async for page in iter_roles_pages(engine, view=view, page_size=page_size):
+            for role in page:
+                listed_count += 1
+                if is_role_complete(role):
+                    on_result(enrich_role(role, role["name"]))
+                else:
+                    incomplete_roles.append(role["name"])
+    finally:
+        engine.close()
+    return listed_count, incomplete_roles, engine.stats
+
+def fetch_roles_list(authed_session, view=None, page_size=None):
+    """Fetch the list of all IAM roles (paginated)."""
+    async def collect():
+        engine = FetchEngine(authed_session)
+        try:
+            return [role async for page in iter_roles_pages(engine, view, page_size) for role in page]
+        finally:
+            engine.close()
+    return asyncio.run(collect())
+
+def is_role_complete(role):
+    """Return True if a listed role carries everything a detail fetch would."""
+    return "includedPermissions" in role and "etag" in role
 
 def extract_services_from_permissions(permissions):
     """Extract a set of GCP services from a list of permissions."""
@@ -48,62 +117,208 @@ def extract_primary_service(role_name):
     """
     Extract the primary service from a role name.
     Example: 'roles/logging.viewer' → 'logging'
+    Custom roles are reported as 'custom'.
     """
     if role_name.startswith("roles/") and "." in role_name:
         return role_name.split("/")[1].split(".")[0]
+    elif "/roles/" in role_name:
+        # Custom roles (organizations/*/roles/* or projects/*/roles/*) carry no service
+        return "custom"
     elif "/" in role_name:
         return role_name.split("/")[1].split(".")[0]
     return "unknown"
 
-def fetch_role_details(authed_session, role_name):
-    """Fetch detailed information for a single role."""
+def enrich_role(data, role_name):
+    """Add the derived services and primaryService fields to a role dict."""
+    permissions = data.get("includedPermissions", [])
+    data["services"] = extract_services_from_permissions(permissions)
+    data["primaryService"] = extract_primary_service(role_name)
+    return data
+
+async def fetch_role_details_async(engine, role_name, on_result=None):
+    """Fetch detailed information for a single role, retried through the fetch engine.
+
+    Returns the enriched role dict, or None once the engine has given up on it.
+    When given, on_result is called with the role as soon as it is fetched.
+    """
     url = f"https://iam.googleapis.com/v1/{role_name}"
     try:
-        response = authed_session.get(url)
-        response.raise_for_status()
-        data = response.json()
+        data = await engine.get_json(url, key=role_name)
+    except FetchError as e:
+        print(f"Error fetching role {role_name}: {e}")
+        return None
+    data = enrich_role(data, role_name)
+    print(f"Fetched {len(data.get('includedPermissions', []))} permissions for role {role_name}")
+    if on_result:
+        on_result(data)
+    return data
+
+async def fetch_all_role_details(authed_session, role_names, on_result=None):
+    """Fetch the details of many roles concurrently.
+
+    Returns the fetched roles (in the order of role_names) and the engine stats.
+    With on_result, roles are handed over as they complete and not retained.
+    """
+    engine = FetchEngine(authed_session)
+    try:
+        results = await asyncio.gather(
+            *(fetch_role_details_async(engine, name, on_result) for name in role_names)
+        )
+    finally:
+        engine.close()
+    print(f"Peak concurrency reached: {engine.limiter.peak}")
+    if on_result:
+        return [], engine.stats
+    return [data for data in results if data], engine.stats
 
-        # Extract services from permissions
-        permissions = data.get("includedPermissions", [])
-        data["services"] = extract_services_from_permissions(permissions)
+async def list_custom_roles(engine, parent, on_result):
+    """List the custom roles of one organization or project, page by page.
 
-        # Add primary service from role name
-        data["primaryService"] = extract_primary_service(role_name)
+    Each role is enriched and handed to on_result. Returns the number of roles.
+    """
+    url = f"https://iam.googleapis.com/v1/{parent}/roles"
+    params = {"view": LIST_VIEW, "pageSize": LIST_PAGE_SIZE}
+    count = 0
+    while True:
+        try:
+            data = await engine.get_json(url, params=dict(params), key=f"{parent} roles")
+        except FetchError as e:
+            print(f"Error listing custom roles of {parent}: {e}")
+            return count
+        for role in data.get("roles", []):
+            on_result(enrich_role(role, role["name"]))
+            count += 1
+        next_token = data.get("nextPageToken")
+        if not next_token:
+            return count
+        params["pageToken"] = next_token
 
-        print(f"Fetched {len(permissions)} permissions for role {role_name}")
-        return data
-    except Exception as e:
-        print(f"Error fetching role {role_name}: {e}")
-        return None
+async def scan_container(engine, container, role_tasks, scan_tasks, on_result):
+    """Start listing the custom roles of the active projects directly under an organization or folder.
+
+    Its subfolders are scanned the same way, as new tasks appended to
+    scan_tasks; the project listings are appended to role_tasks.
+    """
+    try:
+        # Search queries only match the direct children of a parent, and queries on several
+        # fields match any of them, so the state is checked here rather than in the query
+        params = {"query": f"parent:{container}", "pageSize": PROJECTS_PAGE_SIZE}
+        async for projects in iter_pages(engine, PROJECTS_SEARCH_URL, params, f"{container} projects", "projects"):
+            for project in projects:
+                if project.get("state") == "ACTIVE":
+                    role_tasks.append(asyncio.ensure_future(
+                        list_custom_roles(engine, f"projects/{project['projectId']}", on_result)
+                    ))
+        params = {"parent": container, "pageSize": FOLDERS_PAGE_SIZE}
+        async for folders in iter_pages(engine, FOLDERS_LIST_URL, params, f"{container} folders", "folders"):
+            for folder in folders:
+                if folder.get("state", "ACTIVE") == "ACTIVE":
+                    scan_tasks.append(asyncio.ensure_future(
+                        scan_container(engine, folder["name"], role_tasks, scan_tasks, on_result)
+                    ))
+    except FetchError as e:
+        print(f"Error scanning {container}: {e}")
+
+async def fetch_custom_roles(authed_session, org_id, on_result):
+    """List custom roles across an organization and all its active projects.
+
+    The organization's folder tree is walked and each organization/folder is
+    searched for its direct projects, so only projects of this organization
+    are scanned. The custom roles of the projects already found are listed
+    concurrently with the walk, bounded by the engine. The scan lasts longer
+    the more projects there are, so retries get a budget per request rather
+    than one for the whole run.
+    Returns (custom role count, scanned parent count, engine stats).
+    """
+    engine = FetchEngine(authed_session, budget_seconds=None, request_budget_seconds=REQUEST_BUDGET_SECONDS)
+    organization = f"organizations/{org_id}"
+    role_tasks = [asyncio.ensure_future(list_custom_roles(engine, organization, on_result))]
+    scan_tasks = []
+    scan_tasks.append(asyncio.ensure_future(scan_container(engine, organization, role_tasks, scan_tasks, on_result)))
+    try:
+        # Scans append the tasks of the folders they find, until the whole tree is walked
+        scanned = 0
+        while scanned < len(scan_tasks):
+            await scan_tasks[scanned]
+            scanned += 1
+        print(f"Found {len(role_tasks) - 1} projects in {scanned - 1} folders")
+        counts = await asyncio.gather(*role_tasks)
+    except BaseException:
+        for task in role_tasks + scan_tasks:
+            task.cancel()
+        raise
+    finally:
+        engine.close()
+    print(f"Peak concurrency reached: {engine.limiter.peak}")
+    return sum(counts), len(role_tasks), engine.stats
 
 def main():
     authed_session = get_authenticated_session()
+    output_file = catalog_filename(OUTPUT_BASENAME, OUTPUT_FORMAT, OUTPUT_COMPRESSION)
+    writer = RoleCatalogWriter(output_file, output_format=OUTPUT_FORMAT, compression=OUTPUT_COMPRESSION)
+
+    print(f"Fetching list of all roles ({LIST_VIEW} view)...")
+    listed_count, incomplete_roles, stats = asyncio.run(
+        list_roles(authed_session, writer.write, view=LIST_VIEW, page_size=LIST_PAGE_SIZE)
+    )
+    summary = stats.summary()
+    print(f"Total roles found: {listed_count} ({summary['requests']} requests, {summary['throttled']} throttled)")
+    print(f"{listed_count - len(incomplete_roles)} roles complete from listing, {len(incomplete_roles)} need a detail fetch")
+
+    if incomplete_roles:
+        print("Fetching remaining role details concurrently...")
+        _, stats = asyncio.run(
+            fetch_all_role_details(authed_session, incomplete_roles, on_result=writer.write)
+        )
+        summary = stats.summary()
+        print(f"Detail fetch: {summary['requests']} requests, {summary['throttled']} throttled, "
+              f"{summary['retried']} roles retried, {summary['dropped']} roles dropped")
+        for role_name, reason in sorted(stats.dropped.items()):
+            print(f"⚠️  Dropped role {role_name}: {reason}")
+
+    if CUSTOM_ROLES_ORG_ID:
+        print(f"Scanning custom roles of organization {CUSTOM_ROLES_ORG_ID} and its projects...")
+        custom_count, parent_count, stats = asyncio.run(
+            fetch_custom_roles(authed_session, CUSTOM_ROLES_ORG_ID, on_result=writer.write)
+        )
+        summary = stats.summary()
+        print(f"Found {custom_count} custom roles across {parent_count} organizations/projects "
+              f"({summary['requests']} requests, {summary['retried']} retried, {summary['dropped']} dropped)")
+        for key, reason in sorted(stats.dropped.items()):
+            print(f"⚠️  Could not list {key}: {reason}")
 
-    print("Fetching list of all roles...")
-    roles = fetch_roles_list(authed_session)
-    print(f"Total roles found: {len(roles)}")
+    # Keep last run's catalog so this run can be diffed against it
+    previous_file = catalog_filename(OUTPUT_BASENAME + PREVIOUS_SUFFIX, OUTPUT_FORMAT, OUTPUT_COMPRESSION)
+    if os.path.exists(output_file):
+        os.replace(output_file, previous_file)
 
-    detailed_roles = []
+    # Merge the streamed roles into the final, name-ordered catalog
+    saved_count = writer.close()
+    print(f"✅ Saved {saved_count} roles with permissions and services to {output_file}")
 
-    print("Fetching role details in parallel...")
+    # The new catalog is read once: the diff hands its roles over to the index
+    index_roles = []
+    def keep_for_index(role):
+        index_roles.append({"name": role["name"], "includedPermissions": role.get("includedPermissions", [])})
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=10) as executor:
-        futures = {
-            executor.submit(fetch_role_details, authed_session, role['name']): role
-            for role in roles
-        }
-        for i, future in enumerate(concurrent.futures.as_completed(futures), 1):
-            role_name = futures[future]['name']
-            data = future.result()
-            if data:
-                detailed_roles.append(data)
-            print(f"[{i}/{len(roles)}] Processed role {role_name}")
+    if os.path.exists(previous_file):
+        summary = diff_catalog_files(previous_file, output_file, DEFAULT_DELTA_FILE, on_current=keep_for_index)
+        print(f"✅ Catalog delta: {summary['added']} added, {summary['removed']} removed, "
+              f"{summary['changed']} changed, {summary['unchanged']} unchanged → {DEFAULT_DELTA_FILE}")
+    else:
+        for role in iter_catalog(output_file):
+            keep_for_index(role)
 
-    # Save the output JSON
-    with open("roles_with_permissions_and_services.json", "w") as f:
-        json.dump(detailed_roles, f, indent=2)
+    # Build the permission → roles index for fast lookups (see role_index.py)
+    role_count, permission_count = build_index(index_roles, DEFAULT_INDEX_FILE)
+    print(f"✅ Indexed {permission_count} permissions across {role_count} roles into {DEFAULT_INDEX_FILE}")
 
-    print(f"✅ Saved {len(detailed_roles)} roles with permissions and services to roles_with_permissions_and_services.json")
+    # Transport metrics tell API slowness apart from our own connection churn
+    metrics = authed_session.metrics.summary()
+    authed_session.close()
+    print(f"Transport: {metrics['requests']} requests over {metrics['connections_opened']} connections "
+          f"(reuse ratio {metrics['reuse_ratio']}), latency p50 {metrics['p50_ms']} ms, "
+          f"p95 {metrics['p95_ms']} ms, p99 {metrics['p99_ms']} ms")
 
 if __name__ == "__main__":
     main()
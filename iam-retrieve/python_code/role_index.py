@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Permission → roles inverted index for the scraped IAM catalog.
+
+The index is a single binary file that is memory-mapped at query time, so
+lookups never parse the JSON catalog:
+- Every role name and every permission string is stored once (interned).
+- Permissions are sorted, so exact, prefix (`compute.instances.*`) and
+  service (`compute`) lookups are binary searches.
+- Each permission points to a sorted posting list of integer role IDs.
+
+Layout (all integers are little-endian uint32):
+
+    header    magic, role_count, permission_count, then the byte offset of
+              each section below
+    role_offsets        role_count + 1 offsets into role_blob
+    role_blob           UTF-8 role names, sorted
+    perm_offsets        permission_count + 1 offsets into perm_blob
+    perm_blob           UTF-8 permissions, sorted
+    posting_offsets     permission_count + 1 offsets into postings
+    postings            role IDs, sorted within each permission
+
+Usage:
+    python role_index.py compute.instances.setMetadata
+    python role_index.py 'compute.instances.*'
+    python role_index.py --service compute
+"""
+
+import argparse
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from role_writer import iter_catalog
+
+DEFAULT_INDEX_FILE = "roles_permissions.idx"
+DEFAULT_CATALOG_FILE = "roles_with_permissions_and_services.json"
+
+MAGIC = b"IAMIDX01"
+HEADER = struct.Struct("<8s8I")
+
+
+def _uint32_array(values):
+    data = array("I", values)
+    if data.itemsize != 4:
+        raise RuntimeError("uint32 arrays are not 4 bytes wide on this platform")
+    if sys.byteorder != "little":
+        data.byteswap()
+    return data.tobytes()
+
+
+def _string_table(strings):
+    """Encode strings as (offsets bytes, blob bytes padded to 4 bytes)."""
+    offsets = [0]
+    blob = bytearray()
+    for value in strings:
+        blob += value.encode("utf-8")
+        offsets.append(len(blob))
+    blob += b"\0" * (-len(blob) % 4)
+    return _uint32_array(offsets), bytes(blob)
+
+
+def build_index(roles, path=DEFAULT_INDEX_FILE):
+    """Build the inverted index file from role dicts (output of fetch_role_details_async).
+
+    Args:
+        roles (iterable): Role dicts with `name` and `includedPermissions`.
+        path (str): Destination of the index file. Written atomically.
+
+    Returns:
+        tuple: (role_count, permission_count)
+    """
+    role_permissions = {}
+    for role in roles:
+        role_permissions[role["name"]] = role.get("includedPermissions", [])
+
+    role_names = sorted(role_permissions)
+    postings = {}
+    for role_id, role_name in enumerate(role_names):
+        for permission in role_permissions[role_name]:
+            posting = postings.setdefault(sys.intern(permission), [])
+            if not posting or posting[-1] != role_id:
+                posting.append(role_id)
+
+    permissions = sorted(postings)
+    posting_offsets = [0]
+    flat_postings = []
+    for permission in permissions:
+        flat_postings.extend(postings[permission])
+        posting_offsets.append(len(flat_postings))
+
+    role_offsets_bytes, role_blob = _string_table(role_names)
+    perm_offsets_bytes, perm_blob = _string_table(permissions)
+    sections = [
+        role_offsets_bytes,
+        role_blob,
+        perm_offsets_bytes,
+        perm_blob,
+        _uint32_array(posting_offsets),
+        _uint32_array(flat_postings),
+    ]
+
+    positions = []
+    position = HEADER.size
+    for section in sections:
+        positions.append(position)
+        position += len(section)
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(role_names), len(permissions), *positions))
+        for section in sections:
+            f.write(section)
+    os.replace(tmp_path, path)
+
+    return len(role_names), len(permissions)
+
+
+class _StringTable:
+    """Read-only sequence view over an offsets/blob pair, yielding bytes."""
+
+    def __init__(self, offsets, blob):
+        self._offsets = offsets
+        self._blob = blob
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        return self._blob[self._offsets[i]:self._offsets[i + 1]].tobytes()
+
+
+class RoleIndex:
+    """Memory-mapped reader for an index written by build_index()."""
+
+    def __init__(self, path=DEFAULT_INDEX_FILE):
+        if sys.byteorder != "little":
+            raise RuntimeError("RoleIndex only supports little-endian platforms")
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+
+        magic, role_count, perm_count, *positions = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a role index file")
+        positions.append(len(self._mmap))
+        sections = [view[positions[i]:positions[i + 1]] for i in range(6)]
+
+        role_offsets = sections[0].cast("I")
+        perm_offsets = sections[2].cast("I")
+        self._posting_offsets = sections[4].cast("I")
+        self._postings = sections[5].cast("I")
+        self._roles = _StringTable(role_offsets, sections[1])
+        self._permissions = _StringTable(perm_offsets, sections[3])
+        self._views = [role_offsets, perm_offsets, self._posting_offsets, self._postings] + sections + [view]
+        self.role_count = role_count
+        self.permission_count = perm_count
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _role_ids(self, i):
+        return self._postings[self._posting_offsets[i]:self._posting_offsets[i + 1]]
+
+    def _role_names(self, role_ids):
+        return [self._roles[role_id].decode("utf-8") for role_id in role_ids]
+
+    def _prefix_range(self, prefix):
+        """Return the [start, end) range of permissions starting with prefix."""
+        key = prefix.encode("utf-8")
+        start = bisect.bisect_left(self._permissions, key)
+        # 0xFF never occurs in UTF-8, so key + 0xFF sorts after every string starting with key
+        end = bisect.bisect_left(self._permissions, key + b"\xff", lo=start)
+        return start, end
+
+    def lookup(self, permission):
+        """Return the roles granting exactly this permission."""
+        key = permission.encode("utf-8")
+        i = bisect.bisect_left(self._permissions, key)
+        if i < len(self._permissions) and self._permissions[i] == key:
+            return self._role_names(self._role_ids(i))
+        return []
+
+    def permissions_with_prefix(self, prefix):
+        """Return the permissions starting with prefix."""
+        start, end = self._prefix_range(prefix)
+        return [self._permissions[i].decode("utf-8") for i in range(start, end)]
+
+    def lookup_prefix(self, prefix):
+        """Return the roles granting at least one permission starting with prefix."""
+        start, end = self._prefix_range(prefix)
+        role_ids = set()
+        for i in range(start, end):
+            role_ids.update(self._role_ids(i))
+        return self._role_names(sorted(role_ids))
+
+    def lookup_service(self, service):
+        """Return the roles granting at least one permission of a service (e.g. `compute`)."""
+        return self.lookup_prefix(f"{service}.")
+
+    def query(self, pattern):
+        """Dispatch a CLI-style pattern: `svc`, `svc.resource.*` or an exact permission."""
+        if pattern.endswith("*"):
+            return self.lookup_prefix(pattern[:-1])
+        if "." not in pattern:
+            return self.lookup_service(pattern)
+        return self.lookup(pattern)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the permission → roles index")
+    parser.add_argument("queries", nargs="+",
+                        help="Exact permission, prefix ending with '*' (compute.instances.*) or service name")
+    parser.add_argument("--index", default=DEFAULT_INDEX_FILE, help="Path to the index file")
+    parser.add_argument("--build", metavar="CATALOG", nargs="?", const=DEFAULT_CATALOG_FILE,
+                        help="(Re)build the index from a catalog (json/ndjson, optionally compressed) before querying")
+    parser.add_argument("--service", action="store_true", help="Treat every query as a service name")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    if args.build:
+        role_count, perm_count = build_index(iter_catalog(args.build), args.index)
+        print(f"Indexed {perm_count} permissions across {role_count} roles into {args.index}", file=sys.stderr)
+
+    results = {}
+    with RoleIndex(args.index) as index:
+        for query in args.queries:
+            results[query] = index.lookup_service(query) if args.service else index.query(query)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for query, roles in results.items():
+        print(f"{query}: {len(roles)} roles")
+        for role in roles:
+            print(f"  {role}")
+
+
+if __name__ == "__main__":
+    main()
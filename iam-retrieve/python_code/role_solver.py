@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Minimal predefined-role set for a list of required permissions.
+
+Each role's includedPermissions is encoded once as a bitset (a Python int)
+over a global permission dictionary. A query then:
+1. Projects every candidate role onto the required permissions only, so the
+   search works on k-bit integers instead of lists of strings.
+2. Collapses roles with identical coverage (keeping the one with the fewest
+   excess permissions) and drops dominated coverages.
+3. Seeds an upper bound with a greedy cover, then runs a branch-and-bound
+   search for the cover with the fewest roles, breaking ties on the number of
+   excess permissions granted (the union of the permissions of the chosen
+   roles, minus the required ones, so permissions granted by several roles
+   count once).
+
+The search stops at a node or time budget; the best cover found so far is
+then returned with `optimal` set to False.
+
+Usage:
+    python role_solver.py compute.instances.get compute.instances.setMetadata
+    python role_solver.py --file required_permissions.txt --json
+    python role_solver.py --max-seconds 10 --file required_permissions.txt
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from role_writer import iter_catalog
+
+DEFAULT_CATALOG_FILE = "roles_with_permissions_and_services.json"
+MAX_NODES = 2000000  # Search nodes before returning the best cover found so far
+MAX_SEARCH_SECONDS = 2.0  # Wall-clock budget of the branch-and-bound phase
+MAX_ALTERNATIVES = 5  # Equivalent roles listed for each role of the cover
+
+
+class _SearchBudgetExceeded(Exception):
+    pass
+
+
+def _popcount(value):
+    return bin(value).count("1")
+
+
+# int.bit_count is much faster, but only exists from Python 3.10
+_popcount = getattr(int, "bit_count", _popcount)
+
+
+class RoleSolver:
+    """Bitset-encoded role catalog answering minimal-cover queries."""
+
+    def __init__(self, roles):
+        """
+        Args:
+            roles (iterable): Role dicts with `name` and `includedPermissions`
+                (output of fetch_role_details_async).
+        """
+        role_permissions = [(role["name"], role.get("includedPermissions", [])) for role in roles]
+
+        # Global permission dictionary
+        self.permission_ids = {}
+        for _, permissions in role_permissions:
+            for permission in permissions:
+                if permission not in self.permission_ids:
+                    self.permission_ids[permission] = len(self.permission_ids)
+
+        # One bitset per role, plus posting lists to find candidate roles fast
+        nbytes = (len(self.permission_ids) + 7) // 8
+        self.role_names = []
+        self.role_masks = []
+        self.role_sizes = []
+        self.permission_roles = [[] for _ in range(len(self.permission_ids))]
+        for role_id, (name, permissions) in enumerate(role_permissions):
+            bits = bytearray(nbytes)
+            for permission in permissions:
+                bit = self.permission_ids[permission]
+                bits[bit >> 3] |= 1 << (bit & 7)
+                self.permission_roles[bit].append(role_id)
+            mask = int.from_bytes(bits, "little")
+            self.role_names.append(name)
+            self.role_masks.append(mask)
+            self.role_sizes.append(_popcount(mask))
+
+    @classmethod
+    def from_file(cls, path=DEFAULT_CATALOG_FILE, predefined_only=True):
+        """Load a catalog file, by default keeping only predefined (`roles/*`) roles."""
+        roles = iter_catalog(path)
+        if predefined_only:
+            roles = (role for role in roles if role["name"].startswith("roles/"))
+        return cls(roles)
+
+    def encode(self, permissions):
+        """Return (bitset, unknown permissions) for a list of permissions."""
+        mask = 0
+        unknown = []
+        for permission in permissions:
+            bit = self.permission_ids.get(permission)
+            if bit is None:
+                unknown.append(permission)
+            else:
+                mask |= 1 << bit
+        return mask, unknown
+
+    def excess_permissions(self, role_name, required):
+        """Return the permissions a role grants beyond the required ones."""
+        required_mask, _ = self.encode(required)
+        extra = self.role_masks[self.role_names.index(role_name)] & ~required_mask
+        return sorted(p for p, bit in self.permission_ids.items() if extra >> bit & 1)
+
+    def solve(self, required, max_nodes=MAX_NODES, max_seconds=MAX_SEARCH_SECONDS):
+        """Find the smallest set of roles granting every required permission.
+
+        Args:
+            required (list): Required permissions.
+            max_nodes (int): Search node budget.
+            max_seconds (float): Search time budget. When either budget is
+                exhausted, the best cover found so far is returned with
+                `optimal` set to False.
+
+        Returns:
+            dict: The cover (`roles`, ranked by their own excess permissions),
+            its `total_excess` (permissions granted by the cover beyond the
+            required ones, each counted once), the permissions no role grants
+            (`uncoverable`), whether the search completed within its budgets,
+            proving the role count minimal (`optimal`), and search statistics.
+            The excess tie-break is searched over the least-excess role of
+            each coverage, then each role is swapped for an equivalent one
+            when that shrinks the union.
+        """
+        started = time.perf_counter()
+        required = sorted(set(required))
+        required_mask, unknown = self.encode(required)
+        targets = [p for p in required if p in self.permission_ids]
+
+        # Project candidate roles onto the k required permissions
+        coverage = {}
+        for j, permission in enumerate(targets):
+            for role_id in self.permission_roles[self.permission_ids[permission]]:
+                coverage[role_id] = coverage.get(role_id, 0) | (1 << j)
+
+        # Group roles by identical coverage, ranked by excess permissions
+        groups = {}
+        for role_id, cover in coverage.items():
+            excess = self.role_sizes[role_id] - _popcount(cover)
+            groups.setdefault(cover, []).append((excess, self.role_names[role_id], role_id))
+        for members in groups.values():
+            members.sort()
+
+        # Drop coverages that another coverage contains at no more excess
+        patterns = sorted(groups, key=lambda c: (-_popcount(c), groups[c][0][0]))
+        kept = []
+        for cover in patterns:
+            excess = groups[cover][0][0]
+            if not any(cover & ~other == 0 and groups[other][0][0] <= excess for other in kept):
+                kept.append(cover)
+        excess_of = {cover: groups[cover][0][0] for cover in kept}
+        # Excess permissions of each coverage's least-excess role, as a global bitset
+        excess_mask = {cover: self.role_masks[groups[cover][0][2]] & ~required_mask for cover in kept}
+
+        full = (1 << len(targets)) - 1
+        best_count, best_cover = self._greedy(full, kept, excess_of)
+        best_excess = self._union_excess(best_cover, excess_mask)
+        nodes, optimal = 0, True
+
+        if len(kept) > 1 and best_count > 1:
+            k = len(targets)
+            # For each permission bit, the coverages containing it and their union
+            covering = [[c for c in kept if c >> j & 1] for j in range(k)]
+            reach = [0] * k
+            for j in range(k):
+                for cover in covering[j]:
+                    reach[j] |= cover
+            order = sorted(range(k), key=lambda j: len(covering[j]))
+            deadline = started + max_seconds
+            state = {"nodes": 0, "best": (best_count, best_excess, best_cover)}
+
+            def lower_bound(uncovered):
+                # Permissions no single role covers together each need their own role
+                bound, blocked = 0, 0
+                for j in order:
+                    if uncovered >> j & 1 and not blocked >> j & 1:
+                        bound += 1
+                        blocked |= reach[j]
+                return bound
+
+            def search(uncovered, chosen, granted):
+                # granted: union of the excess permissions of the chosen roles, which only grows
+                state["nodes"] += 1
+                if state["nodes"] > max_nodes or (state["nodes"] & 1023 == 0 and time.perf_counter() > deadline):
+                    raise _SearchBudgetExceeded
+                if not uncovered:
+                    excess = _popcount(granted)
+                    if (len(chosen), excess) < state["best"][:2]:
+                        state["best"] = (len(chosen), excess, list(chosen))
+                    return
+                # Branch on the uncovered permission with the fewest covering roles,
+                # trying the coverages that close the most of the gap first
+                pivot = next(j for j in order if uncovered >> j & 1)
+                branches = sorted(covering[pivot], key=lambda c: (-_popcount(c & uncovered), excess_of[c]))
+                for cover in branches:
+                    remaining = uncovered & ~cover
+                    bound = len(chosen) + 1 + lower_bound(remaining)
+                    if bound > state["best"][0]:
+                        continue
+                    union = granted | excess_mask[cover]
+                    if bound == state["best"][0] and _popcount(union) >= state["best"][1]:
+                        continue
+                    chosen.append(cover)
+                    search(remaining, chosen, union)
+                    chosen.pop()
+
+            try:
+                search(full, [], 0)
+            except _SearchBudgetExceeded:
+                optimal = False
+            nodes = state["nodes"]
+            best_count, best_excess, best_cover = state["best"]
+
+        # Among roles of identical coverage, prefer those whose excess the rest of the cover already grants
+        picks = [groups[cover][0] for cover in best_cover]
+        improved = True
+        while improved:
+            improved = False
+            for i, cover in enumerate(best_cover):
+                others = 0
+                for j, (_, _, role_id) in enumerate(picks):
+                    if j != i:
+                        others |= self.role_masks[role_id] & ~required_mask
+                current = _popcount(others | self.role_masks[picks[i][2]] & ~required_mask)
+                for member in groups[cover]:
+                    union = _popcount(others | self.role_masks[member[2]] & ~required_mask)
+                    if union < current:
+                        picks[i], current, improved = member, union, True
+        granted = 0
+        for _, _, role_id in picks:
+            granted |= self.role_masks[role_id] & ~required_mask
+        best_excess = _popcount(granted)
+
+        roles = []
+        for cover, (excess, name, _) in zip(best_cover, picks):
+            roles.append({
+                "name": name,
+                "covers": [targets[j] for j in range(len(targets)) if cover >> j & 1],
+                "excess": excess,
+                "alternatives": [
+                    {"name": alt_name, "excess": alt_excess}
+                    for alt_excess, alt_name, _ in groups[cover][:1 + MAX_ALTERNATIVES] if alt_name != name
+                ][:MAX_ALTERNATIVES],
+            })
+        roles.sort(key=lambda r: (r["excess"], r["name"]))
+
+        return {
+            "required": required,
+            "uncoverable": unknown,
+            "roles": roles,
+            "total_excess": best_excess,
+            "optimal": optimal,
+            "candidates": len(coverage),
+            "nodes": nodes,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+        }
+
+    @staticmethod
+    def _greedy(full, patterns, excess_of):
+        """Greedy cover: most newly covered permissions first, then least excess."""
+        uncovered = full
+        chosen = []
+        while uncovered:
+            cover = max(patterns, key=lambda c: (_popcount(c & uncovered), -excess_of[c]))
+            chosen.append(cover)
+            uncovered &= ~cover
+        return len(chosen), chosen
+
+    @staticmethod
+    def _union_excess(covers, excess_mask):
+        """Number of excess permissions granted by a cover, each counted once."""
+        granted = 0
+        for cover in covers:
+            granted |= excess_mask[cover]
+        return _popcount(granted)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the smallest set of predefined roles granting some permissions")
+    parser.add_argument("permissions", nargs="*", help="Required permissions")
+    parser.add_argument("--file", help="File with one required permission per line")
+    parser.add_argument("--catalog", default=DEFAULT_CATALOG_FILE, help="Role catalog produced by main.py")
+    parser.add_argument("--include-custom", action="store_true",
+                        help="Also consider custom roles present in the catalog")
+    parser.add_argument("--max-seconds", type=float, default=MAX_SEARCH_SECONDS,
+                        help="Time budget of the search (default: %(default)s)")
+    parser.add_argument("--max-nodes", type=int, default=MAX_NODES,
+                        help="Node budget of the search (default: %(default)s)")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args()
+
+    required = list(args.permissions)
+    if args.file:
+        with open(args.file) as f:
+            required.extend(line.strip() for line in f if line.strip())
+    if not required:
+        parser.error("no required permissions given")
+
+    solver = RoleSolver.from_file(args.catalog, predefined_only=not args.include_custom)
+    result = solver.solve(required, max_nodes=args.max_nodes, max_seconds=args.max_seconds)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    status = "optimal" if result["optimal"] else "best found"
+    print(f"{len(result['roles'])} roles ({status}), {result['total_excess']} excess permissions, "
+          f"{result['elapsed_ms']} ms")
+    for role in result["roles"]:
+        print(f"  {role['name']} (+{role['excess']} excess) covers {len(role['covers'])} permissions")
+        for alt in role["alternatives"]:
+            print(f"      or {alt['name']} (+{alt['excess']} excess)")
+    if not result["optimal"]:
+        print("optimal: false (search budget exhausted, a smaller cover may exist; "
+              "raise --max-seconds or --max-nodes)", file=sys.stderr)
+    if result["uncoverable"]:
+        print("No predefined role grants:", file=sys.stderr)
+        for permission in result["uncoverable"]:
+            print(f"  {permission}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
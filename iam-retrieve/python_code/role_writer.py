@@ -0,0 +1,236 @@
+"""
+Streaming writer and reader for the role catalog.
+
+Roles are written as soon as they are fetched instead of being accumulated
+in memory: each role is serialized to a compact line, buffered in small
+sorted runs that are spilled to temporary files, and a final k-way merge
+writes them in role-name order. The catalog file is therefore identical from
+one run to the next regardless of fetch order.
+
+Output formats:
+- "json": the historical pretty-printed JSON array (indent=2)
+- "ndjson": one compact JSON object per line
+
+Either can be compressed with gzip (standard library) or zstd (requires the
+optional `zstandard` package).
+"""
+
+import gzip
+import heapq
+import io
+import json
+import os
+import tempfile
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+OUTPUT_FORMATS = ("json", "ndjson")
+COMPRESSIONS = (None, "gzip", "zstd")
+COMPRESSION_EXTENSIONS = {None: "", "gzip": ".gz", "zstd": ".zst"}
+RUN_SIZE = 250  # Roles buffered in memory before a sorted run is spilled to disk
+READ_SIZE = 1 << 16  # Characters read at a time when streaming a JSON array
+
+
+def catalog_filename(basename, output_format="json", compression=None):
+    """Return the catalog file name for a format, e.g. `roles.ndjson.gz`."""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+    return f"{basename}.{output_format}{COMPRESSION_EXTENSIONS[compression]}"
+
+
+def _detect_compression(path):
+    for compression, extension in COMPRESSION_EXTENSIONS.items():
+        if extension and path.endswith(extension):
+            return compression
+    return None
+
+
+class _ClosingGzipFile(gzip.GzipFile):
+    """GzipFile that also closes the file object it was given."""
+
+    def close(self):
+        fileobj = self.fileobj
+        super().close()
+        if fileobj is not None:
+            fileobj.close()
+
+
+def _open_binary(path, mode, compression):
+    if compression is None:
+        return open(path, mode)
+    if compression == "gzip":
+        if mode == "rb":
+            return gzip.open(path, mode)
+        # No file name and mtime=0 keep compressed output byte-identical between runs
+        return _ClosingGzipFile(filename="", mode=mode, fileobj=open(path, mode), mtime=0)
+    if zstandard is None:
+        raise RuntimeError("zstd compression requires the 'zstandard' package")
+    if mode == "wb":
+        return zstandard.ZstdCompressor().stream_writer(open(path, mode), closefd=True)
+    return zstandard.ZstdDecompressor().stream_reader(open(path, mode), closefd=True)
+
+
+def open_catalog(path, mode="r"):
+    """Open a catalog file as text, decompressing according to its extension."""
+    binary = _open_binary(path, mode + "b", _detect_compression(path))
+    return io.TextIOWrapper(binary, encoding="utf-8")
+
+
+def _iter_json_array(f):
+    """Yield the elements of a JSON array one at a time.
+
+    f is positioned right after the opening bracket. Only the element being
+    decoded and one read ahead are held in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+    while True:
+        # Skip the whitespace and separator before the next element
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position == len(buffer):
+            if eof:
+                raise ValueError("Unterminated JSON array")
+            buffer = f.read(READ_SIZE)
+            position = 0
+            eof = not buffer
+            continue
+        if buffer[position] == "]":
+            return
+        try:
+            element, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # Element cut by the read: keep its start and read more
+            chunk = f.read(READ_SIZE)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield element
+        position = end
+
+
+def _is_sorted(roles):
+    previous = None
+    for role in roles:
+        if previous is not None and role["name"] < previous:
+            return False
+        previous = role["name"]
+    return True
+
+
+def iter_catalog(path, sort=False):
+    """Yield role dicts from a catalog file in any supported format.
+
+    Roles are streamed one at a time whatever the format. With sort=True,
+    pretty JSON arrays are first walked once to check their order: those
+    written by older versions in fetch order are then loaded and sorted by
+    role name, the only case where the whole catalog is held in memory.
+    NDJSON catalogs are streamed as-is: RoleCatalogWriter always writes them
+    in role-name order.
+    """
+    with open_catalog(path) as f:
+        first = f.read(1)
+        while first.isspace():
+            first = f.read(1)
+        if first == "[":
+            if sort and not _is_sorted(iter_catalog(path)):
+                roles = list(_iter_json_array(f))
+                roles.sort(key=lambda role: role["name"])
+                yield from roles
+                return
+            yield from _iter_json_array(f)
+            return
+        line = first + f.readline()
+        while line:
+            if line.strip():
+                yield json.loads(line)
+            line = f.readline()
+
+
+def _iter_run(path):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            name, _, payload = line.rstrip("\n").partition("\t")
+            yield name, payload
+
+
+class RoleCatalogWriter:
+    """Write roles to a catalog file as they arrive, in deterministic order.
+
+    Args:
+        path (str): Final catalog path. Written atomically on close().
+        output_format (str): "json" or "ndjson".
+        compression (str, optional): None, "gzip" or "zstd".
+        run_size (int): Roles kept in memory before spilling a sorted run.
+    """
+
+    def __init__(self, path, output_format="json", compression=None, run_size=RUN_SIZE):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {output_format}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            raise RuntimeError("zstd compression requires the 'zstandard' package")
+        self.path = path
+        self.output_format = output_format
+        self.compression = compression
+        self.run_size = run_size
+        self.count = 0
+        self._buffer = []
+        self._runs = []
+        self._spool_dir = tempfile.mkdtemp(prefix="roles-spool-")
+
+    def write(self, role):
+        """Add one role to the catalog."""
+        self._buffer.append((role["name"], json.dumps(role, separators=(",", ":"))))
+        if len(self._buffer) >= self.run_size:
+            self._spill()
+
+    def _spill(self):
+        if not self._buffer:
+            return
+        self._buffer.sort()
+        run_path = os.path.join(self._spool_dir, f"run-{len(self._runs):05d}")
+        with open(run_path, "w", encoding="utf-8") as f:
+            for name, payload in self._buffer:
+                f.write(f"{name}\t{payload}\n")
+        self._runs.append(run_path)
+        self._buffer = []
+
+    def close(self):
+        """Merge all runs into the final catalog file and return the role count."""
+        self._spill()
+        tmp_path = f"{self.path}.tmp"
+        previous = None
+        with io.TextIOWrapper(_open_binary(tmp_path, "wb", self.compression), encoding="utf-8") as out:
+            if self.output_format == "json":
+                out.write("[")
+            for name, payload in heapq.merge(*(_iter_run(run) for run in self._runs)):
+                if name == previous:
+                    continue
+                if self.output_format == "json":
+                    role = json.dumps(json.loads(payload), indent=2)
+                    out.write(",\n  " if previous is not None else "\n  ")
+                    out.write(role.replace("\n", "\n  "))
+                else:
+                    out.write(payload + "\n")
+                previous = name
+                self.count += 1
+            if self.output_format == "json":
+                out.write("\n]" if previous is not None else "]")
+        os.replace(tmp_path, self.path)
+
+        for run in self._runs:
+            os.remove(run)
+        os.rmdir(self._spool_dir)
+        return self.count
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Offline checks of the month-over-month catalog diff against fixture catalogs (no GCP access needed)
+"""
+import json
+import os
+import sys
+import tempfile
+from catalog_diff import diff_catalog_files, diff_catalogs
+
+def role(name, etag, permissions, stage="GA"):
+    """A role as written to the catalog."""
+    return {"name": name, "etag": etag, "stage": stage, "includedPermissions": permissions}
+
+# Fixture catalogs, sorted by role name
+PREVIOUS = [
+    role("roles/a.viewer", "e1", ["a.things.get"]),
+    role("roles/b.admin", "e2", ["b.things.get", "b.things.delete"], stage="BETA"),
+    role("roles/c.old", "e3", ["c.things.get"]),
+]
+CURRENT = [
+    role("roles/a.viewer", "e1", ["a.things.get"]),
+    role("roles/b.admin", "e4", ["b.things.get", "b.things.create"]),
+    role("roles/d.new", "e5", ["d.things.get"]),
+]
+
+def test_added_removed_changed():
+    """New roles are added in full, missing ones removed by name, others diffed permission by permission."""
+    delta = diff_catalogs(PREVIOUS, CURRENT)
+    assert delta["summary"] == {"added": 1, "removed": 1, "changed": 1, "unchanged": 1}
+    assert delta["added"] == [CURRENT[2]]
+    assert delta["removed"] == ["roles/c.old"]
+    assert delta["changed"] == [{
+        "name": "roles/b.admin",
+        "etag": "e4",
+        "permissionsAdded": ["b.things.create"],
+        "permissionsRemoved": ["b.things.delete"],
+        "stage": {"from": "BETA", "to": "GA"},
+    }]
+
+def test_new_etag_same_content():
+    """A new etag without any tracked change is not reported."""
+    delta = diff_catalogs([role("roles/a", "e1", ["p"])], [role("roles/a", "e2", ["p"])])
+    assert delta["summary"] == {"added": 0, "removed": 0, "changed": 0, "unchanged": 1}
+
+def test_unsorted_catalog():
+    """Catalogs out of role-name order are rejected instead of producing a wrong delta."""
+    try:
+        diff_catalogs(list(reversed(PREVIOUS)), CURRENT)
+    except ValueError:
+        return
+    raise AssertionError("unsorted catalog accepted")
+
+def test_files_any_order():
+    """Catalog files are sorted when read, and each current role is handed to on_current."""
+    with tempfile.TemporaryDirectory() as directory:
+        previous_path = os.path.join(directory, "previous.json")
+        current_path = os.path.join(directory, "current.json")
+        delta_path = os.path.join(directory, "delta.json")
+        with open(previous_path, "w") as f:
+            json.dump(list(reversed(PREVIOUS)), f, indent=2)
+        with open(current_path, "w") as f:
+            f.writelines(json.dumps(r) + "\n" for r in CURRENT)
+        seen = []
+        summary = diff_catalog_files(previous_path, current_path, delta_path,
+                                     on_current=lambda r: seen.append(r["name"]))
+        with open(delta_path) as f:
+            document = json.load(f)
+    assert summary == {"added": 1, "removed": 1, "changed": 1, "unchanged": 1}
+    assert document["removed"] == ["roles/c.old"]
+    assert seen == [r["name"] for r in CURRENT]
+
+if __name__ == "__main__":
+    tests = [test_added_removed_changed, test_new_etag_same_content, test_unsorted_catalog,
+             test_files_any_order]
+    failures = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Offline checks of the permission → roles index on a fixture catalog (no GCP access needed)
+"""
+import os
+import sys
+import tempfile
+from role_index import RoleIndex, build_index
+
+# Fixture catalog, in fetch order
+ROLES = [
+    {"name": "roles/compute.viewer", "includedPermissions": ["compute.instances.get", "compute.instances.list"]},
+    {"name": "roles/compute.admin", "includedPermissions": [
+        "compute.instances.get", "compute.instances.list", "compute.instances.setMetadata", "compute.disks.create"]},
+    {"name": "roles/computeExtra.user", "includedPermissions": ["computeExtra.things.get"]},
+    {"name": "roles/storage.admin", "includedPermissions": ["storage.buckets.get", "storage.buckets.get"]},
+]
+
+def with_index(check):
+    """Build the fixture index in a temporary directory and run check(index) on it."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "roles.idx")
+        counts = build_index(ROLES, path)
+        with RoleIndex(path) as index:
+            return counts, check(index)
+
+def test_counts():
+    """Every role and every distinct permission is stored once."""
+    built, read = with_index(lambda index: (index.role_count, index.permission_count))
+    assert built == read == (4, 6)
+
+def test_exact_lookup():
+    """Exact lookups return the roles granting the permission, sorted; unknown ones return nothing."""
+    _, results = with_index(lambda index: (
+        index.lookup("compute.instances.get"),
+        index.lookup("storage.buckets.get"),
+        index.lookup("compute.instances.delete"),
+    ))
+    assert results == (["roles/compute.admin", "roles/compute.viewer"], ["roles/storage.admin"], [])
+
+def test_prefix_lookup():
+    """Prefix lookups match every permission starting with the prefix."""
+    _, results = with_index(lambda index: (
+        index.query("compute.instances.*"),
+        index.permissions_with_prefix("compute.instances."),
+    ))
+    assert results == (
+        ["roles/compute.admin", "roles/compute.viewer"],
+        ["compute.instances.get", "compute.instances.list", "compute.instances.setMetadata"],
+    )
+
+def test_service_lookup():
+    """Service lookups stop at the service name, so `compute` does not match `computeExtra`."""
+    _, results = with_index(lambda index: (index.query("compute"), index.lookup_service("computeExtra")))
+    assert results == (["roles/compute.admin", "roles/compute.viewer"], ["roles/computeExtra.user"])
+
+if __name__ == "__main__":
+    tests = [test_counts, test_exact_lookup, test_prefix_lookup, test_service_lookup]
+    failures = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failures else 0)
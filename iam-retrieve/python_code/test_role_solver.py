@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Offline checks of the minimal role set solver against a brute-force search (no GCP access needed)
+"""
+import itertools
+import random
+import sys
+from role_solver import RoleSolver
+
+def role(name, *permissions):
+    """A role as written to the catalog."""
+    return {"name": name, "includedPermissions": list(permissions)}
+
+def granted(roles, names):
+    """Union of the permissions of the named roles."""
+    by_name = {r["name"]: set(r["includedPermissions"]) for r in roles}
+    return set().union(*(by_name[name] for name in names))
+
+def brute_force(roles, required):
+    """(role count, least union excess) of the smallest covers, by trying every combination."""
+    required = set(required)
+    candidates = [r for r in roles if required & set(r["includedPermissions"])]
+    for count in range(1, len(candidates) + 1):
+        excesses = [
+            len(granted(roles, names) - required)
+            for names in itertools.combinations([r["name"] for r in candidates], count)
+            if required <= granted(roles, names)
+        ]
+        if excesses:
+            return count, min(excesses)
+    return None
+
+def test_single_role():
+    """One role granting everything wins over a pair, whatever its excess."""
+    roles = [role("roles/a", "p1"), role("roles/b", "p2"), role("roles/ab", "p1", "p2", "p3")]
+    result = RoleSolver(roles).solve(["p1", "p2"])
+    assert [r["name"] for r in result["roles"]] == ["roles/ab"]
+    assert (result["total_excess"], result["optimal"]) == (1, True)
+
+def test_shared_excess_counted_once():
+    """A permission granted by several roles of the cover is one excess permission."""
+    roles = [role("roles/a", "p1", "x"), role("roles/b", "p2", "x"), role("roles/c", "p2", "y", "z")]
+    result = RoleSolver(roles).solve(["p1", "p2"])
+    assert sorted(r["name"] for r in result["roles"]) == ["roles/a", "roles/b"]
+    assert result["total_excess"] == 1
+
+def test_uncoverable():
+    """Permissions no role grants are reported, the others are still covered."""
+    roles = [role("roles/a", "p1")]
+    result = RoleSolver(roles).solve(["p1", "unknown.permission"])
+    assert result["uncoverable"] == ["unknown.permission"]
+    assert [r["name"] for r in result["roles"]] == ["roles/a"]
+
+def test_matches_brute_force():
+    """On small random catalogs, the cover is valid, as small as possible and its excess is exact."""
+    rnd = random.Random(0)
+    permissions = [f"svc.perm{i}" for i in range(10)]
+    for _ in range(200):
+        roles = [role(f"roles/r{i}", *rnd.sample(permissions, rnd.randint(1, 5)))
+                 for i in range(rnd.randint(2, 8))]
+        solver = RoleSolver(roles)
+        required = [p for p in rnd.sample(permissions, rnd.randint(1, 5)) if p in solver.permission_ids]
+        if not required:
+            continue
+        result = solver.solve(required)
+        names = [r["name"] for r in result["roles"]]
+        count, least_excess = brute_force(roles, required)
+        assert set(required) <= granted(roles, names)
+        assert len(names) == count, (required, names, count)
+        assert result["total_excess"] == len(granted(roles, names) - set(required))
+        assert result["total_excess"] >= least_excess
+        assert result["optimal"]
+
+def test_budget_exhausted():
+    """A search cut off by its budget still returns a valid cover, flagged as not optimal."""
+    rnd = random.Random(1)
+    permissions = [f"svc.perm{i}" for i in range(40)]
+    roles = [role(f"roles/r{i}", *rnd.sample(permissions, 4)) for i in range(60)]
+    solver = RoleSolver(roles)
+    required = [p for p in permissions[:20] if p in solver.permission_ids]
+    result = solver.solve(required, max_nodes=1)
+    assert not result["optimal"]
+    assert set(required) <= granted(roles, [r["name"] for r in result["roles"]])
+
+if __name__ == "__main__":
+    tests = [test_single_role, test_shared_excess_counted_once, test_uncoverable,
+             test_matches_brute_force, test_budget_exhausted]
+    failures = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failures else 0)
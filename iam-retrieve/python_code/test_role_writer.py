@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Offline checks of the streaming role catalog writer and reader (no GCP access needed)
+"""
+import gzip
+import json
+import os
+import sys
+import tempfile
+from role_writer import RoleCatalogWriter, catalog_filename, iter_catalog
+
+def role(name):
+    """A role as returned by the IAM API."""
+    return {"name": name, "title": name.split("/")[-1], "includedPermissions": [f"{name[6:]}.get"]}
+
+# Fetch order, with a role fetched twice
+FETCHED = [role("roles/c"), role("roles/a"), role("roles/d"), role("roles/a"), role("roles/b")]
+EXPECTED = [role("roles/a"), role("roles/b"), role("roles/c"), role("roles/d")]
+
+def write(directory, output_format, compression=None, run_size=2, roles=FETCHED):
+    """Write roles to a catalog in directory, returns (path, count)."""
+    path = os.path.join(directory, catalog_filename("roles", output_format, compression))
+    writer = RoleCatalogWriter(path, output_format, compression, run_size=run_size)
+    for r in roles:
+        writer.write(r)
+    return path, writer.close()
+
+def test_sorted_and_deduplicated():
+    """Roles come out in name order, once each, across several spilled runs."""
+    with tempfile.TemporaryDirectory() as directory:
+        path, count = write(directory, "json")
+        with open(path) as f:
+            roles = json.load(f)
+    assert count == 4
+    assert roles == EXPECTED
+
+def test_fetch_order_independent():
+    """The catalog is byte-identical whatever the fetch order."""
+    with tempfile.TemporaryDirectory() as directory:
+        path, _ = write(directory, "json")
+        with open(path, "rb") as f:
+            first = f.read()
+        path, _ = write(directory, "json", roles=list(reversed(FETCHED)), run_size=3)
+        with open(path, "rb") as f:
+            second = f.read()
+    assert first == second
+
+def test_ndjson_gzip():
+    """Compressed NDJSON catalogs hold one role per line and are read back by iter_catalog."""
+    with tempfile.TemporaryDirectory() as directory:
+        path, count = write(directory, "ndjson", "gzip")
+        with gzip.open(path, "rt") as f:
+            lines = [json.loads(line) for line in f]
+        roles = list(iter_catalog(path))
+    assert path.endswith("roles.ndjson.gz")
+    assert count == 4
+    assert lines == roles == EXPECTED
+
+def test_empty_catalog():
+    """A catalog without roles is still a valid JSON array."""
+    with tempfile.TemporaryDirectory() as directory:
+        path, count = write(directory, "json", roles=[])
+        with open(path) as f:
+            roles = json.load(f)
+    assert (count, roles) == (0, [])
+
+def test_read_legacy_unsorted():
+    """Pretty JSON arrays in fetch order are streamed as-is, or sorted on request."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "legacy.json")
+        with open(path, "w") as f:
+            json.dump(FETCHED[:3], f, indent=2)
+        assert list(iter_catalog(path)) == FETCHED[:3]
+        assert [r["name"] for r in iter_catalog(path, sort=True)] == ["roles/a", "roles/c", "roles/d"]
+
+if __name__ == "__main__":
+    tests = [test_sorted_and_deduplicated, test_fetch_order_independent, test_ndjson_gzip,
+             test_empty_catalog, test_read_legacy_unsorted]
+    failures = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failures else 0)
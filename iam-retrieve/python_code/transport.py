@@ -0,0 +1,164 @@
+"""
+Pooled HTTP transport for the IAM roles scraper.
+
+Replaces a single shared AuthorizedSession with:
+- One urllib3 connection pool per host, sized to the fetch concurrency and
+  blocking when full, so every worker thread reuses a keep-alive connection
+  instead of opening (and discarding) extra ones.
+- One lightweight requests.Session per worker thread on top of that pool.
+- Credentials refreshed once, under a lock, and shared by all threads.
+- Per-run metrics: connections opened, connection reuse ratio and
+  p50/p95/p99 request latency.
+"""
+
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from google.auth.transport.requests import Request as AuthRequest
+
+from fetch_engine import MAX_CONCURRENCY
+
+POOL_SIZE = MAX_CONCURRENCY  # Connections kept per host, matched to the fetch concurrency
+POOL_HOSTS = 4  # Distinct hosts with a cached pool (IAM, Resource Manager, ...)
+REQUEST_TIMEOUT = 60  # Seconds
+
+
+class TransportMetrics:
+    """Thread-safe connection and latency counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+        self.latencies = []
+
+    def record_connection(self):
+        with self._lock:
+            self.connections_opened += 1
+
+    def record_request(self, latency):
+        with self._lock:
+            self.latencies.append(latency)
+
+    def summary(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            opened = self.connections_opened
+        requests_count = len(latencies)
+
+        def percentile(q):
+            if not latencies:
+                return None
+            index = min(len(latencies) - 1, max(0, int(round(q * len(latencies))) - 1))
+            return round(latencies[index] * 1000, 1)
+
+        return {
+            "requests": requests_count,
+            "connections_opened": opened,
+            "reuse_ratio": round(1 - opened / requests_count, 3) if requests_count else None,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+        }
+
+
+def _counting_pool(pool_class, metrics):
+    """Return a connection pool class that counts every new connection."""
+
+    class CountingPool(pool_class):
+        def _new_conn(self):
+            metrics.record_connection()
+            return super()._new_conn()
+
+    return CountingPool
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter with an explicit, blocking pool size and connection counting."""
+
+    def __init__(self, metrics, pool_size=POOL_SIZE, pool_hosts=POOL_HOSTS):
+        self.metrics = metrics
+        super().__init__(pool_connections=pool_hosts, pool_maxsize=pool_size,
+                         pool_block=True, max_retries=0)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _counting_pool(HTTPConnectionPool, self.metrics),
+            "https": _counting_pool(HTTPSConnectionPool, self.metrics),
+        }
+
+
+class SharedCredentials:
+    """Credentials refreshed once under a lock and shared across threads."""
+
+    def __init__(self, credentials):
+        self.credentials = credentials
+        self._lock = threading.Lock()
+        self._auth_request = AuthRequest()
+
+    def refresh(self, stale_token=None):
+        """Refresh if the token expired, or if it is still the one a 401 rejected.
+
+        Threads racing on the same expired or rejected token refresh only once.
+        """
+        with self._lock:
+            if not self.credentials.valid or (stale_token and self.credentials.token == stale_token):
+                self.credentials.refresh(self._auth_request)
+
+    @property
+    def token(self):
+        if not self.credentials.valid:
+            self.refresh()
+        return self.credentials.token
+
+
+class PooledTransport:
+    """Authorized GET transport shared by the scraper's worker threads.
+
+    Exposes the get() subset of AuthorizedSession used by the scraper.
+    """
+
+    def __init__(self, credentials, pool_size=POOL_SIZE, timeout=REQUEST_TIMEOUT):
+        self.credentials = SharedCredentials(credentials)
+        self.metrics = TransportMetrics()
+        self.timeout = timeout
+        self._adapter = PooledAdapter(self.metrics, pool_size=pool_size)
+        self._local = threading.local()
+        self._sessions = []
+        self._sessions_lock = threading.Lock()
+        self.credentials.refresh()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", self._adapter)
+            session.mount("http://", self._adapter)
+            self._local.session = session
+            with self._sessions_lock:
+                self._sessions.append(session)
+        return session
+
+    def get(self, url, params=None, **kwargs):
+        """GET a URL with a bearer token, refreshing it once on a 401."""
+        kwargs.setdefault("timeout", self.timeout)
+        session = self._session()
+        for attempt in range(2):
+            token = self.credentials.token
+            start = time.perf_counter()
+            response = session.get(url, params=params, headers={"Authorization": f"Bearer {token}"}, **kwargs)
+            self.metrics.record_request(time.perf_counter() - start)
+            if response.status_code != 401 or attempt:
+                return response
+            self.credentials.refresh(stale_token=token)
+        return response
+
+    def close(self):
+        with self._sessions_lock:
+            for session in self._sessions:
+                session.close()
+            self._sessions = []
+        self._adapter.close()
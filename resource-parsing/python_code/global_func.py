@@ -1,5 +1,19 @@
+import concurrent.futures
+import gzip
+import io
 import json
 from google.cloud import storage
+from google.cloud.exceptions import NotFound
+
+# Storage clients are reused across uploads (one per project)
+_storage_clients = {}
+
+
+def get_storage_client(project_id=None):
+    """Returns a shared storage client for the given project."""
+    if project_id not in _storage_clients:
+        _storage_clients[project_id] = storage.Client(project=project_id)
+    return _storage_clients[project_id]
 
 
 def export_to_json(data, filename):
@@ -8,6 +22,122 @@ def export_to_json(data, filename):
         json.dump(data, f, indent=4)
 
 
+class JsonArrayWriter:
+    """Writes a JSON array to a file item by item.
+
+    The output is formatted exactly like export_to_json (indent=4), but items
+    are written as they are appended instead of being held in memory.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._open(open(filename, 'w'))
+
+    def _open(self, text_file):
+        self.count = 0
+        self._file = text_file
+        self._file.write("[")
+
+    def append(self, item):
+        self._file.write(",\n    " if self.count else "\n    ")
+        self._file.write(json.dumps(item, indent=4).replace("\n", "\n    "))
+        self.count += 1
+
+    def close(self):
+        self._file.write("\n]" if self.count else "]")
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonExportBuffer(JsonArrayWriter):
+    """Serializes a JSON array straight into memory, optionally gzip-compressed.
+
+    After close(), `data` holds the bytes to upload and `content_encoding` the
+    matching Content-Encoding ("gzip" or None). Nothing is written to disk.
+    """
+
+    def __init__(self, compress=True):
+        self.filename = None
+        self.data = None
+        self.content_encoding = "gzip" if compress else None
+        self._raw = io.BytesIO()
+        # mtime=0 keeps identical content byte-identical between runs
+        self._gzip = gzip.GzipFile(fileobj=self._raw, mode="wb", mtime=0) if compress else None
+        self._open(io.TextIOWrapper(self._gzip or self._raw, encoding="utf-8"))
+
+    def close(self):
+        self._file.write("\n]" if self.count else "]")
+        self._file.flush()
+        self._file.detach()
+        if self._gzip:
+            self._gzip.close()
+        self.data = self._raw.getvalue()
+        self._raw = None
+
+
+def upload_bytes_to_gcs(bucket_name, data, destination_blob_name, project_id=None,
+                        content_type="application/json", content_encoding=None):
+    """Uploads in-memory bytes to a Google Cloud Storage bucket.
+
+    Args:
+        bucket_name (str): Name of the GCS bucket.
+        data (bytes): The object content.
+        destination_blob_name (str): Name of the blob (file) in GCS.
+        project_id (str, optional): The ID of the GCP project. If not specified,
+            the default project will be used.
+        content_type (str): Content-Type of the object.
+        content_encoding (str, optional): Content-Encoding of the object, e.g.
+            "gzip" for compressed data (GCS then serves it decompressed to
+            clients that do not accept gzip).
+    """
+    bucket = get_storage_client(project_id).bucket(bucket_name)
+    blob = bucket.blob(destination_blob_name)
+    blob.content_encoding = content_encoding
+    blob.upload_from_string(data, content_type=content_type)
+
+    print(
+        f"Uploaded {len(data)} bytes to {bucket_name}/{destination_blob_name}."
+    )
+
+
+def download_json_from_gcs(bucket_name, blob_name, project_id=None):
+    """Downloads and parses a JSON object from GCS.
+
+    Returns:
+        The parsed JSON, or None if the object does not exist.
+    """
+    blob = get_storage_client(project_id).bucket(bucket_name).blob(blob_name)
+    try:
+        return json.loads(blob.download_as_bytes())
+    except NotFound:
+        return None
+
+
+def upload_exports_to_gcs(bucket_name, exports, project_id=None):
+    """Uploads several closed JsonExportBuffer objects concurrently.
+
+    Args:
+        bucket_name (str): Name of the GCS bucket.
+        exports (dict): Destination blob name -> closed JsonExportBuffer.
+        project_id (str, optional): The ID of the GCP project.
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(exports))) as executor:
+        futures = [
+            executor.submit(
+                upload_bytes_to_gcs, bucket_name, export.data, destination_blob_name,
+                project_id=project_id, content_encoding=export.content_encoding
+            )
+            for destination_blob_name, export in exports.items()
+        ]
+        for future in futures:
+            future.result()
+
+
 def upload_json_to_gcs(bucket_name, source_file_name, destination_blob_name, project_id=None):
     """Uploads a JSON file to a Google Cloud Storage bucket.
 
@@ -19,8 +149,7 @@ def upload_json_to_gcs(bucket_name, source_file_name, destination_blob_name, pro
             the default project will be used. 
     """
 
-    storage_client = storage.Client(project=project_id)
-    bucket = storage_client.bucket(bucket_name)
+    bucket = get_storage_client(project_id).bucket(bucket_name)
     blob = bucket.blob(destination_blob_name)
 
     blob.upload_from_filename(source_file_name)
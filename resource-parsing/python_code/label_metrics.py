@@ -0,0 +1,64 @@
+import collections
+
+PRESENT = "present"
+ABSENT = "absent"
+NONE_VALUE = "none"  # Dimension value of a project without the label
+OTHER_VALUE = "other"  # Dimension value of the labels beyond a dimension's top values
+
+
+class LabelCounter:
+    """Counts projects grouped by a few label dimensions.
+
+    Each dimension maps a metric label to a project label, either by presence
+    ("present"/"absent") or by value. Value dimensions keep their
+    `max_values` most frequent values; the others are counted as "other", so
+    the number of series stays bounded whatever the label values.
+
+    Args:
+        dimensions (dict): Metric label -> {"label": project label,
+            "presence": True to only record whether the label is set}.
+        max_values (int): Distinct values kept per value dimension.
+    """
+
+    def __init__(self, dimensions, max_values):
+        self.dimensions = dict(dimensions)
+        self.max_values = max_values
+        self._labels = [spec["label"] for spec in self.dimensions.values()]
+        self._presence = [spec.get("presence", False) for spec in self.dimensions.values()]
+        self._counts = collections.Counter()
+
+    def add(self, labels):
+        """Counts one project from its labels."""
+        key = tuple(
+            (ABSENT if value is None else PRESENT) if presence else (NONE_VALUE if value is None else value)
+            for value, presence in zip(map(labels.get, self._labels), self._presence)
+        )
+        self._counts[key] += 1
+
+    def _kept_values(self):
+        """Returns, per dimension, the values kept as-is (None for presence dimensions)."""
+        kept = []
+        for index, presence in enumerate(self._presence):
+            if presence:
+                kept.append(None)
+                continue
+            frequencies = collections.Counter()
+            for key, count in self._counts.items():
+                frequencies[key[index]] += count
+            # Ties are broken by value so the kept set does not depend on project order
+            top = sorted(frequencies.items(), key=lambda item: (-item[1], item[0]))[:self.max_values]
+            kept.append({value for value, _ in top} | {NONE_VALUE})
+        return kept
+
+    def counts(self):
+        """Returns {metric labels dict as a sorted tuple of items: project count}."""
+        kept = self._kept_values()
+        names = list(self.dimensions)
+        grouped = collections.Counter()
+        for key, count in self._counts.items():
+            values = (
+                value if allowed is None or value in allowed else OTHER_VALUE
+                for value, allowed in zip(key, kept)
+            )
+            grouped[tuple(zip(names, values))] += count
+        return dict(sorted(grouped.items()))
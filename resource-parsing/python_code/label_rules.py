@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import re
+
+RULE_TYPES = ("required", "allowed_values", "dependency")
+
+
+class LabelRuleError(ValueError):
+    """Raised when a rule file contains an invalid rule."""
+
+
+def load_rules(path, default=None):
+    """Loads the list of rules from a JSON rule file.
+
+    Returns `default` when the file does not exist.
+    """
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def _compile_pattern(rule, pattern):
+    try:
+        # Whole-value match, like the allowed values of a label policy
+        return re.compile(pattern).fullmatch
+    except re.error as e:
+        raise LabelRuleError(f"Rule {rule.get('name')!r}: invalid pattern {pattern!r}: {e}") from e
+
+
+def _condition(rule, condition):
+    """Compiles an {"key": ..., "pattern": ...} condition into (key, match)."""
+    if not isinstance(condition, dict) or "key" not in condition:
+        raise LabelRuleError(f"Rule {rule.get('name')!r}: conditions need a 'key'")
+    pattern = condition.get("pattern")
+    return condition["key"], _compile_pattern(rule, pattern) if pattern is not None else None
+
+
+def _value_check(match):
+    """Returns a check(value) that passes for a present label matching `match` (if any)."""
+    if match is None:
+        return lambda value: value is not None
+    return lambda value: value is not None and match(value) is not None
+
+
+class LabelRuleSet:
+    """A compiled set of label rules, evaluated in one pass per project.
+
+    Every rule is reduced to checks on a single label key:
+    - required / allowed_values: the value of the key fails the rule.
+    - dependency: the value of the "if" key triggers the rule, and the value of
+      the "then" key satisfies it; the rule fails when triggered and not satisfied.
+
+    For each key, the outcome of every value seen so far is cached as one
+    packed bitmask (failed | triggered | satisfied rules). Label values repeat
+    heavily across an organization, so evaluating a project is one dict lookup
+    per rule key, whatever the number of rules.
+
+    Args:
+        rules (list): Rule definitions, as loaded from the rule file.
+    """
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+        names = [rule.get("name") if isinstance(rule, dict) else None for rule in self.rules]
+        if None in names or len(set(names)) != len(names):
+            raise LabelRuleError("Every rule needs a unique 'name'")
+        self.names = names
+        self.fingerprint = hashlib.sha256(
+            json.dumps(self.rules, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:16]
+
+        # Bit offsets of the three sections of a packed bitmask
+        size = len(self.rules)
+        self._mask = (1 << size) - 1
+        self._triggered_shift = size
+        self._satisfied_shift = 2 * size
+
+        checks = {}  # key -> [(packed bit, check(value) -> bit is set)]
+        for bit, rule in enumerate(self.rules):
+            for key, packed_bit, check in self._compile_rule(rule, bit):
+                checks.setdefault(key, []).append((packed_bit, check))
+        self._keys = [(key, key_checks, {}) for key, key_checks in checks.items()]
+
+    def _compile_rule(self, rule, bit):
+        """Yields the (key, packed bit, check) triplets of one rule."""
+        rule_type = rule.get("type")
+        if rule_type == "required":
+            key, _ = _condition(rule, rule)
+            yield key, 1 << bit, lambda value: value is None
+
+        elif rule_type == "allowed_values":
+            key, match = _condition(rule, rule)
+            if match is None:
+                raise LabelRuleError(f"Rule {rule.get('name')!r}: allowed_values needs a 'pattern'")
+            required = rule.get("required", False)
+            yield key, 1 << bit, lambda value: (
+                required if value is None else match(value) is None
+            )
+
+        elif rule_type == "dependency":
+            if_key, if_match = _condition(rule, rule.get("if"))
+            then_key, then_match = _condition(rule, rule.get("then"))
+            yield if_key, 1 << (bit + self._triggered_shift), _value_check(if_match)
+            yield then_key, 1 << (bit + self._satisfied_shift), _value_check(then_match)
+
+        else:
+            raise LabelRuleError(
+                f"Rule {rule.get('name')!r}: unknown type {rule_type!r} (expected one of {RULE_TYPES})"
+            )
+
+    def evaluate(self, labels):
+        """Returns the bitmask of the rules failed by a project's labels (0 if compliant)."""
+        packed = 0
+        for key, checks, cache in self._keys:
+            value = labels.get(key)
+            bits = cache.get(value)
+            if bits is None:
+                bits = 0
+                for packed_bit, check in checks:
+                    if check(value):
+                        bits |= packed_bit
+                cache[value] = bits
+            packed |= bits
+        triggered = packed >> self._triggered_shift
+        satisfied = packed >> self._satisfied_shift
+        return (packed | (triggered & ~satisfied)) & self._mask
+
+    def failed_rules(self, mask):
+        """Returns the names of the rules set in a failed rules bitmask."""
+        return [name for bit, name in enumerate(self.names) if mask >> bit & 1]
+
+
+class LabelRuleResults:
+    """Per-rule pass/fail buckets and counters for a run.
+
+    Projects are grouped by their failed rules bitmask; there are few distinct
+    masks, so recording a project is a single append and the per-rule buckets
+    are only expanded when the report is built.
+    """
+
+    def __init__(self, rule_set):
+        self.rule_set = rule_set
+        self.total = 0
+        self._by_mask = {}
+
+    def record(self, project_id, mask):
+        """Records the evaluation result of one project."""
+        self.total += 1
+        bucket = self._by_mask.get(mask)
+        if bucket is None:
+            bucket = self._by_mask[mask] = []
+        bucket.append(project_id)
+
+    @property
+    def compliant(self):
+        """Number of projects passing every rule."""
+        return len(self._by_mask.get(0, ()))
+
+    def counters(self):
+        """Returns {rule name: {"passed": n, "failed": n}}."""
+        failed = [0] * len(self.rule_set.names)
+        for mask, project_ids in self._by_mask.items():
+            for bit in range(len(failed)):
+                if mask >> bit & 1:
+                    failed[bit] += len(project_ids)
+        return {
+            name: {"passed": self.total - failed[bit], "failed": failed[bit]}
+            for bit, name in enumerate(self.rule_set.names)
+        }
+
+    def report(self):
+        """Yields one entry per rule, with its counters and pass/fail buckets."""
+        counters = self.counters()
+        # Sorted buckets make the per-rule sorts below cheap merges of sorted runs
+        buckets = [(mask, sorted(project_ids)) for mask, project_ids in self._by_mask.items()]
+        for bit, rule in enumerate(self.rule_set.rules):
+            passed, failed = [], []
+            for mask, project_ids in buckets:
+                (failed if mask >> bit & 1 else passed).extend(project_ids)
+            yield {
+                "Rule": rule["name"],
+                "Type": rule["type"],
+                "Passed": counters[rule["name"]]["passed"],
+                "Failed": counters[rule["name"]]["failed"],
+                "Failed Projects": sorted(failed),
+                "Passed Projects": sorted(passed),
+            }
@@ -1,8 +1,25 @@
 from google.cloud import resourcemanager_v3
 from google.cloud import monitoring_v3
-from global_func import export_to_json 
-from global_func import upload_json_to_gcs 
+from google.api_core import exceptions
+from google.api_core import retry
+from global_func import JsonExportBuffer
+from global_func import upload_exports_to_gcs
+from global_func import upload_bytes_to_gcs
+from global_func import download_json_from_gcs
+from snapshot import ProjectSnapshot
+from label_rules import LabelRuleResults
+from label_rules import LabelRuleSet
+from label_rules import load_rules
+from label_metrics import LabelCounter
+from asset_export import iter_export_pages
+from owner_inference import OwnerInference
 
+import concurrent.futures
+import contextlib
+import json
+import queue
+import re
+import threading
 import time
 import functions_framework # Import for HTTP triggering
 # Authenticate (ensure you have set up Google Cloud authentication)
@@ -12,6 +29,12 @@ import functions_framework # Import for HTTP triggering
 def process_projects_http(request):
     """HTTP Cloud Function entry point. 
 
+    Organization or folder scopes can be given as a JSON body
+    ({"scopes": ["organizations/123", "folders/456"]}) or as a comma-separated
+    `scopes` query parameter. They are scanned concurrently, each with its own
+    exports and metrics; without scopes, every project visible to the function
+    is processed as one run.
+
     Args:
         request (flask.Request): The request object.
 
@@ -20,78 +43,228 @@ def process_projects_http(request):
         Response object using `make_response`
         <https://flask.palletsprojects.com/en/1.1.x/api/#flask.make_response>.
     """
-    process_projects()  # Call your main processing logic
-    return "Project processing complete!"
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        return {"error": "The JSON body must be an object, e.g. {\"scopes\": [\"organizations/123\"]}"}, 400
+    scopes = body.get("scopes") or [s for s in request.args.get("scopes", "").split(",") if s]
+    if not isinstance(scopes, list):
+        return {"error": "scopes must be a list of organizations/<id> or folders/<id>"}, 400
+    if not scopes:
+        process_projects()  # Call your main processing logic
+        return "Project processing complete!"
+
+    invalid = [scope for scope in scopes if not isinstance(scope, str) or not SCOPE_PATTERN.fullmatch(scope)]
+    if invalid:
+        return {"error": f"Invalid scopes (expected organizations/<id> or folders/<id>): {invalid}"}, 400
+    return process_scopes(list(dict.fromkeys(scopes)))
 
     
-# Create a client
+# Create the clients, shared by every scope of an invocation
 client = resourcemanager_v3.ProjectsClient()
+folders_client = resourcemanager_v3.FoldersClient()
 
 # Create a Cloud Monitoring client (can be global or passed as argument)
 monitoring_client = monitoring_v3.MetricServiceClient()
 
 # Define the filter expression
 filter_expression = 'state:ACTIVE'
+ACTIVE_STATE = resourcemanager_v3.Project.State.ACTIVE
+# Projects are processed page by page while the next page is being fetched
+PAGE_SIZE = 500 # Projects per search_projects page
+PAGE_PREFETCH = 1 # Pages fetched ahead of processing (bounds memory to a few pages)
+# Local path, gs://bucket/object or gs://bucket/prefix/ of a Cloud Asset Inventory
+# newline-delimited JSON export to read projects from, instead of paging search_projects
+ASSET_EXPORT_URI = None
 # Create the request with the filter
 request = resourcemanager_v3.SearchProjectsRequest(
-    query=filter_expression
+    query=filter_expression,
+    page_size=PAGE_SIZE
 )
 
+# Organization and folder scopes of a multi-scope invocation
+SCOPE_PATTERN = re.compile(r"(organizations|folders)/\d+")
+SCOPE_CONCURRENCY = 4 # Scopes scanned at the same time
+
 # Constants (consider using uppercase for constants)
-OWNER_LABEL = "owner" # Label to filter on 
+OWNER_LABEL = "owner" # Label required by the default rules
+LABEL_RULES_FILE = "label_rules.json" # Label rules, deployed next to main.py
+DEFAULT_LABEL_RULES = [{"name": f"{OWNER_LABEL}-required", "type": "required", "key": OWNER_LABEL}]
 PROJECTS_WITH_OWNER_FILE = "projects_with_owner.json"
 PROJECTS_WITHOUT_OWNER_FILE = "projects_without_owner.json"
+PROJECTS_COMPLIANT_FILE = "projects_compliant.json" # Projects passing every rule
+PROJECTS_NON_COMPLIANT_FILE = "projects_non_compliant.json" # Projects failing at least one rule
+LABEL_COMPLIANCE_FILE = "label_compliance.json" # Per-rule counters and pass/fail buckets
 BUCKET_NAME = "gcp-bucket-name" # Google Bucket Name
 BUCKET_PROJECT = "project-id-exemple" # Google Project ID 
+EXPORT_GZIP = True # Upload exports gzip-compressed (Content-Encoding: gzip)
+EXPORT_PREFIX = "label-parsing/" # Scoped runs write under label-parsing/<organizations|folders>-<id>/
+MANIFEST_FILE = "manifest.json" # Fingerprints of the last uploaded snapshot
+DELTA_DIR = "deltas/" # One delta object per run with changes
+FULL_EXPORT_DELTA_RATIO = 0.1 # Full exports are rewritten when more than this share of projects changed
+FULL_EXPORT_MAX_AGE_SECONDS = 24 * 3600 # ... or when they are older than this, otherwise only a delta is published
+
+# Owner inference for projects without the owner label (needs resourcemanager.projects.getIamPolicy)
+INFER_OWNERS = True
+OWNER_CACHE_FILE = "owner_cache.json" # Inferred owners and policy etags of the last runs
+OWNER_INFERENCE_CONCURRENCY = 32 # IAM policies fetched concurrently
+OWNER_CACHE_TTL_SECONDS = 24 * 3600 # Inferences younger than this are reused without fetching the policy
+OWNER_INFERENCE_BUDGET_SECONDS = 120 # No new policy is fetched after this, cached inferences are used instead
 
 # Monitoring 
 PROJECT_ID = "project-id-exemple" # Google Project ID 
+METRIC_MODE = "aggregated" # "aggregated": a few series of project counts, "per_project": one series per project
+METRIC_NAME = "project_labels_counter" # Per-project metric
+AGGREGATED_METRIC_NAME = "project_labels_count" # Aggregated metric
+# Scoped runs write their own metric types, whose series always carry a `scope` label:
+# the labels of an existing descriptor cannot change
+SCOPED_METRIC_NAME = "project_labels_counter_by_scope"
+SCOPED_AGGREGATED_METRIC_NAME = "project_labels_count_by_scope"
+# Metric label -> project label; presence dimensions only record whether the label is set
+METRIC_DIMENSIONS = {
+    "owner": {"label": OWNER_LABEL, "presence": True},
+    "environment": {"label": "environment"},
+    "cost_center": {"label": "cost-center"},
+}
+METRIC_MAX_VALUES = 20 # Values kept per value dimension, the others are counted as "other"
+MONITORING_BATCH_SIZE = 200 # Cloud Monitoring accepts up to 200 time series per request
+MONITORING_WRITE_ATTEMPTS = 3 # Attempts for series rejected by a partially failed batch
+
+# Transient errors retried by the client library on a whole batch
+MONITORING_RETRY = retry.Retry(
+    predicate=retry.if_exception_type(
+        exceptions.ServiceUnavailable,
+        exceptions.DeadlineExceeded,
+        exceptions.InternalServerError,
+    ),
+    initial=1.0,
+    maximum=10.0,
+    timeout=60.0,
+)
 
+# Rules are compiled once, at cold start, and reused by every invocation
+RULE_SET = LabelRuleSet(load_rules(LABEL_RULES_FILE, default=DEFAULT_LABEL_RULES))
 
 
 
-def process_project_parse(project, projects_with_owner, projects_without_owner):
-    """Processes a single project and appends its details to the appropriate list."""
+def process_project_parse(project, exports, results, snapshot=None, owner_inference=None):
+    """Evaluates the label rules on a single project and appends its details to the appropriate lists.
+
+    `exports` holds the with/without owner lists and the compliant/non-compliant
+    lists of the rule set. The result is recorded in `results` (a
+    LabelRuleResults). When a ProjectSnapshot is given, the exported record is
+    also fingerprinted. When an OwnerInference is given, projects without the
+    owner label are handed over to it instead, and exported once their owner is
+    inferred. Returns True if the project passes every rule.
+    """
     project_info = {
         "Project Name": project.name.split("/")[-1],
         "Project ID": project.project_id,
         "Project Number": project.name,
         "Labels": dict(project.labels)  # Convert to regular dictionary
     }
-    if "owner" in project.labels:
-        projects_with_owner.append(project_info)
+    failed = RULE_SET.evaluate(project_info["Labels"])
+    results.record(project.project_id, failed)
+    has_owner = OWNER_LABEL in project_info["Labels"]
+    destinations = (
+        exports[PROJECTS_WITH_OWNER_FILE if has_owner else PROJECTS_WITHOUT_OWNER_FILE],
+        exports[PROJECTS_NON_COMPLIANT_FILE if failed else PROJECTS_COMPLIANT_FILE],
+    )
+    if owner_inference is not None and not has_owner:
+        owner_inference.submit(project_info, destinations)
     else:
-        projects_without_owner.append(project_info)
+        export_project(project_info, destinations, snapshot)
+    return not failed
+
+
+def export_project(project_info, destinations, snapshot=None):
+    """Appends an exported project record to each of its exports, and fingerprints it."""
+    if snapshot is not None:
+        snapshot.add(project_info)
+    for destination in destinations:
+        destination.append(project_info)
+
+
+def iter_scope_requests(scope):
+    """Yields one search request per container of a scope: the scope itself and all its folders.
+
+    Search queries only match the direct children of a parent, so the folder
+    tree is walked with list_folders as the requests are consumed. Queries on
+    several fields match any of them, so the state is not part of the query:
+    inactive projects are dropped by iter_project_pages.
+    """
+    containers = [scope]
+    while containers:
+        container = containers.pop()
+        yield resourcemanager_v3.SearchProjectsRequest(
+            query=f"parent:{container}",
+            page_size=PAGE_SIZE,
+        )
+        containers.extend(folder.name for folder in folders_client.list_folders(parent=container))
+
+
+def iter_project_pages(search_requests, prefetch=PAGE_PREFETCH):
+    """Yields search_projects results one page at a time.
+
+    A background thread fetches up to `prefetch` pages ahead, so paging overlaps
+    with processing while memory stays bounded by a few pages. The requests
+    are run one after the other, and only active projects are yielded.
+
+    Close the generator when stopping early: the background thread then stops
+    instead of waiting forever for the next page to be consumed.
+    """
+    pages = queue.Queue(maxsize=prefetch)
+    done = object()
+    stop = threading.Event()
+
+    def put(item):
+        """Queues an item for the consumer, returns False once it is gone."""
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for search_request in search_requests:
+                for page in client.search_projects(request=search_request).pages:
+                    if not put([project for project in page.projects if project.state == ACTIVE_STATE]):
+                        return
+            put(done)
+        except Exception as e:  # Re-raised in the consumer thread
+            put(e)
 
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            page = pages.get()
+            if page is done:
+                return
+            if isinstance(page, Exception):
+                raise page
+            yield page
+    finally:
+        stop.set()
 
-def write_metric_for_each_project(project_name, metric_name, metric_value):
-    """Writes a metric for a single project with a specified value.
+
+def build_project_series(project_name, metric_name, metric_value, interval):
+    """Builds the time series of a metric for a single project.
 
     Args:
-        project_name: The name of the project.
+        project_name: The project (as returned by search_projects).
         metric_name: The name of the custom metric.
         metric_value: The value to write for this project's metric.
+        interval: The monitoring_v3.TimeInterval shared by all series of a run.
     """
     # Aggregate labels into a string
     aggregated_labels = ','.join(project_name.labels.keys()) 
 
-    project_id = f"projects/{PROJECT_ID}" 
-    time_series_list = []
-
-    now = time.time()
-    seconds = int(now)
-    nanos = int((now - seconds) * 10**9)
-    interval = monitoring_v3.TimeInterval(
-        {"end_time": {"seconds": seconds, "nanos": nanos}}
-    )
-
     series = monitoring_v3.TimeSeries()
     series.metric.type = f"custom.googleapis.com/{metric_name}" 
     series.resource.type = "global"
 
-    # Correctly initialize labels as an empty dictionary
-    # series.metric.labels = {} 
-
     # Add project_name and project_id as metric labels
     series.metric.labels["project_name"] = project_name.display_name
     series.metric.labels["project_id"] = project_name.project_id
@@ -99,37 +272,272 @@ def write_metric_for_each_project(project_name, metric_name, metric_value):
 
     point = monitoring_v3.Point({"interval": interval, "value": {"int64_value": metric_value}})
     series.points = [point]
-    time_series_list.append(series)
+    return series
+
+
+def build_count_series(metric_name, metric_labels, count, interval):
+    """Builds the gauge series of the number of projects sharing the same metric labels.
+
+    Args:
+        metric_name: The name of the custom metric.
+        metric_labels: (metric label, value) pairs of this group of projects.
+        count: The number of projects in the group.
+        interval: The monitoring_v3.TimeInterval shared by all series of a run.
+    """
+    series = monitoring_v3.TimeSeries()
+    series.metric.type = f"custom.googleapis.com/{metric_name}"
+    series.resource.type = "global"
+    for name, value in metric_labels:
+        series.metric.labels[name] = value
+
+    point = monitoring_v3.Point({"interval": interval, "value": {"int64_value": count}})
+    series.points = [point]
+    return series
+
+
+def current_interval():
+    """Returns a TimeInterval ending now."""
+    now = time.time()
+    seconds = int(now)
+    nanos = int((now - seconds) * 10**9)
+    return monitoring_v3.TimeInterval(
+        {"end_time": {"seconds": seconds, "nanos": nanos}}
+    )
+
+
+def failed_series_indexes(error, batch_length):
+    """Returns the indexes of the series rejected in a failed create_time_series call.
+
+    Cloud Monitoring writes the valid series of a batch and reports the rejected
+    ones as `timeSeries[i]` in the error message. When no index is reported, the
+    whole batch is considered failed.
+    """
+    indexes = sorted({int(i) for i in re.findall(r"timeSeries\[(\d+)\]", str(error))})
+    indexes = [i for i in indexes if i < batch_length]
+    return indexes if indexes else list(range(batch_length))
+
+
+def write_time_series(series_list, batch_size=MONITORING_BATCH_SIZE):
+    """Writes time series in batches through the shared monitoring client.
+
+    Transient errors are retried on the whole batch by the client library. When a
+    batch partially fails, only the rejected series are retried, up to
+    MONITORING_WRITE_ATTEMPTS times.
+
+    Returns:
+        A (written, failed) tuple of series counts.
+    """
+    project_name = f"projects/{PROJECT_ID}"
+    written = 0
+    failed = 0
+
+    for start in range(0, len(series_list), batch_size):
+        pending = series_list[start:start + batch_size]
+        for attempt in range(1, MONITORING_WRITE_ATTEMPTS + 1):
+            try:
+                monitoring_client.create_time_series(
+                    name=project_name, time_series=pending, retry=MONITORING_RETRY
+                )
+                written += len(pending)
+                pending = []
+                break
+            except (exceptions.PermissionDenied, exceptions.NotFound) as e:
+                print(f"Error writing {len(pending)} time series: {e}")
+                break
+            except exceptions.GoogleAPICallError as e:
+                rejected = failed_series_indexes(e, len(pending))
+                written += len(pending) - len(rejected)
+                pending = [pending[i] for i in rejected]
+                print(f"{len(pending)} time series rejected (attempt {attempt}/{MONITORING_WRITE_ATTEMPTS}): {e}")
+                if attempt < MONITORING_WRITE_ATTEMPTS:
+                    time.sleep(2 ** attempt)
+            except exceptions.GoogleAPIError as e:
+                # MONITORING_RETRY gave up (RetryError): Monitoring is unavailable, the batch is failed
+                # but the run goes on, metrics never prevent the export
+                print(f"Error writing {len(pending)} time series: {e}")
+                break
+        failed += len(pending)
+
+    print(f"Wrote {written} time series in batches of {batch_size}, {failed} failed")
+    return written, failed
+
+
+def process_scopes(scopes):
+    """Processes several organization or folder scopes concurrently.
+
+    The API clients and the owner inference thread pool are shared by all
+    scopes. Returns the per-scope results and timings.
+    """
+    start = time.monotonic()
+    owner_executor = concurrent.futures.ThreadPoolExecutor(max_workers=OWNER_INFERENCE_CONCURRENCY)
+
+    def run(scope):
+        scope_start = time.monotonic()
+        try:
+            result = {"scope": scope, "status": "ok", **process_projects(scope, owner_executor)}
+        except Exception as e:  # One failing scope does not stop the others
+            print(f"[{scope}] Processing failed: {e}")
+            result = {"scope": scope, "status": "error", "error": str(e)}
+        result["seconds"] = round(time.monotonic() - scope_start, 2)
+        return result
 
-    monitoring_client = monitoring_v3.MetricServiceClient()
-    monitoring_client.create_time_series(name=project_id, time_series=time_series_list)
-    print(f"Successfully wrote '{metric_name}' metric for project: {project_name.display_name}")
+    with owner_executor, concurrent.futures.ThreadPoolExecutor(max_workers=SCOPE_CONCURRENCY) as executor:
+        results = list(executor.map(run, scopes))
+    return {"scopes": results, "seconds": round(time.monotonic() - start, 2)}
+
+
+def scope_prefix(scope=None):
+    """Returns the GCS prefix of the exports of a scope (EXPORT_PREFIX without scope)."""
+    return f"{EXPORT_PREFIX}{scope.replace('/', '-')}/" if scope else EXPORT_PREFIX
 
 
 # Process each project initially
-def process_projects():
-    """Fetches projects, categorizes them, and exports to JSON."""
-    # Process projects
-    projects_with_owner = []
-    projects_without_owner = []
-
-    projects = list(client.search_projects(request=request))
-    for project in projects:
-        process_project_parse(project, projects_with_owner, projects_without_owner)  # Pass the lists here
-        # Write the metric to Cloud Monitoring
-        # Calculate metric_value for this project (customize as needed)
-        metric_value = 1  # Replace with your logic
-        # Call the function for each project individually
-        write_metric_for_each_project(project, "project_labels_counter", metric_value)
-
-    # Print the count of projects with the "owner" label
-    print(f"Number of projects with '{OWNER_LABEL}' label: {len(projects_with_owner)}")
-    print(f"Number of projects without '{OWNER_LABEL}' label: {len(projects_without_owner)}")
-    print(f"Total number of projects {len(projects)}")
+def process_projects(scope=None, owner_executor=None):
+    """Fetches projects page by page, evaluates the label rules, and exports to JSON.
 
-    
-    export_to_json(projects_with_owner, PROJECTS_WITH_OWNER_FILE)
-    export_to_json(projects_without_owner, PROJECTS_WITHOUT_OWNER_FILE)
+    Args:
+        scope (str, optional): Only process the projects under this organization
+            or folder, with exports under its own prefix and metrics under the
+            scoped metric types. By default, every project visible to the
+            function is processed.
+        owner_executor (concurrent.futures.Executor, optional): Thread pool
+            shared by the owner inferences of concurrent scopes.
+
+    Returns:
+        A dict of project counts, whether anything was uploaded and whether the full exports were rewritten.
+    """
+    total_projects = 0
+    written = 0
+    failed = 0
+    results = LabelRuleResults(RULE_SET)
+    prefix = scope_prefix(scope)
+    log = f"[{scope}] " if scope else ""
+    scope_labels = (("scope", scope),) if scope else ()
+    metric_name = SCOPED_METRIC_NAME if scope else METRIC_NAME
+    aggregated_metric_name = SCOPED_AGGREGATED_METRIC_NAME if scope else AGGREGATED_METRIC_NAME
+
+    # Fingerprints of the last uploaded snapshot, to skip no-op uploads
+    snapshot = ProjectSnapshot(
+        download_json_from_gcs(BUCKET_NAME, f"{prefix}{MANIFEST_FILE}", project_id=BUCKET_PROJECT),
+        rules=RULE_SET.fingerprint,
+    )
+
+    # All series of a run share the same end time and are written in batches
+    interval = current_interval()
+    time_series = []
+    # Aggregated mode: projects are only counted here, per-project detail stays in the exports
+    label_counter = LabelCounter(METRIC_DIMENSIONS, METRIC_MAX_VALUES)
+
+    # Policies of the unlabeled projects are fetched in the background while paging
+    owner_inference = None
+    if INFER_OWNERS:
+        owner_inference = OwnerInference(
+            client,
+            cache=download_json_from_gcs(BUCKET_NAME, f"{prefix}{OWNER_CACHE_FILE}", project_id=BUCKET_PROJECT),
+            max_workers=OWNER_INFERENCE_CONCURRENCY,
+            ttl_seconds=OWNER_CACHE_TTL_SECONDS,
+            budget_seconds=OWNER_INFERENCE_BUDGET_SECONDS,
+            executor=owner_executor,
+        )
+
+    # Exports are serialized straight into (compressed) memory buffers: the owner exports
+    # keep their historical object names, the rule set exports are published next to them
+    export_files = (PROJECTS_WITH_OWNER_FILE, PROJECTS_WITHOUT_OWNER_FILE,
+                    PROJECTS_COMPLIANT_FILE, PROJECTS_NON_COMPLIANT_FILE)
+    with contextlib.ExitStack() as stack:
+        exports = {name: stack.enter_context(JsonExportBuffer(compress=EXPORT_GZIP)) for name in export_files}
+        if ASSET_EXPORT_URI:
+            pages = iter_export_pages(ASSET_EXPORT_URI, PAGE_SIZE, project_id=BUCKET_PROJECT, scope=scope)
+        elif scope:
+            pages = iter_project_pages(iter_scope_requests(scope))
+        else:
+            pages = iter_project_pages([request])
+        # Closing the pages stops their background fetch if processing fails
+        with contextlib.closing(pages):
+            for page in pages:
+                for project in page:
+                    total_projects += 1
+                    process_project_parse(project, exports, results, snapshot, owner_inference)
+                    if METRIC_MODE == "per_project":
+                        # Calculate metric_value for this project (customize as needed)
+                        metric_value = 1  # Replace with your logic
+                        series = build_project_series(project, metric_name, metric_value, interval)
+                        for name, value in scope_labels:
+                            series.metric.labels[name] = value
+                        time_series.append(series)
+                    else:
+                        label_counter.add(project.labels)
+
+                # Write the full batches to Cloud Monitoring, keep the remainder for the next page
+                full_batches = len(time_series) - len(time_series) % MONITORING_BATCH_SIZE
+                if full_batches:
+                    page_written, page_failed = write_time_series(time_series[:full_batches])
+                    written += page_written
+                    failed += page_failed
+                    time_series = time_series[full_batches:]
+                print(f"{log}Processed {total_projects} projects so far")
+
+        # Export the unlabeled projects once their owner is inferred
+        if owner_inference is not None:
+            for project_info, destinations in owner_inference.results():
+                export_project(project_info, destinations, snapshot)
+            print(f"{log}Owner inference: {owner_inference.stats}")
+
+    if owner_inference is not None and owner_inference.stats["fetched"]:
+        upload_bytes_to_gcs(BUCKET_NAME, json.dumps(owner_inference.cache_document()).encode("utf-8"),
+                            f"{prefix}{OWNER_CACHE_FILE}", project_id=BUCKET_PROJECT)
+
+    if METRIC_MODE != "per_project":
+        time_series = [
+            build_count_series(aggregated_metric_name, scope_labels + metric_labels, count, interval)
+            for metric_labels, count in label_counter.counts().items()
+        ]
+    if time_series:
+        page_written, page_failed = write_time_series(time_series)
+        written += page_written
+        failed += page_failed
+    print(f"{log}Metrics: {written} time series written, {failed} failed")
+
+    # Print the aggregated counters of every rule
+    for name, counts in results.counters().items():
+        print(f"{log}Rule '{name}': {counts['passed']} passed, {counts['failed']} failed")
+    print(f"{log}Number of compliant projects: {results.compliant}")
+    print(f"{log}Number of non-compliant projects: {total_projects - results.compliant}")
+    print(f"{log}Total number of projects {total_projects}")
+    summary = {
+        "projects": total_projects,
+        "compliant": results.compliant,
+        "metrics_written": written,
+        "metrics_failed": failed,
+        "uploaded": False,
+        "full_export": False,
+    }
+
+    if not snapshot.changed():
+        print(f"{log}No project changed since the last run, skipping upload")
+        return summary
+
+    # Most changed runs only publish the delta, the full exports are rewritten from time to time
+    full_export = snapshot.needs_full_export(FULL_EXPORT_DELTA_RATIO, FULL_EXPORT_MAX_AGE_SECONDS)
+    if full_export:
+        with JsonExportBuffer(compress=EXPORT_GZIP) as label_compliance:
+            for entry in results.report():
+                label_compliance.append(entry)
+
+        exports[LABEL_COMPLIANCE_FILE] = label_compliance
+        upload_exports_to_gcs(BUCKET_NAME, {f"{prefix}{name}": export for name, export in exports.items()},
+                              project_id=BUCKET_PROJECT)
 
-    upload_json_to_gcs(BUCKET_NAME, PROJECTS_WITH_OWNER_FILE, f"label-parsing/{PROJECTS_WITH_OWNER_FILE}", project_id=BUCKET_PROJECT)
-    upload_json_to_gcs(BUCKET_NAME, PROJECTS_WITHOUT_OWNER_FILE, f"label-parsing/{PROJECTS_WITHOUT_OWNER_FILE}", project_id=BUCKET_PROJECT)
+    # Publish what changed, then the manifest once the exports are in place
+    if snapshot.previous_manifest is not None:
+        delta = snapshot.delta()
+        delta_blob = f"{prefix}{DELTA_DIR}{delta['generated'].replace(':', '')}.json"
+        upload_bytes_to_gcs(BUCKET_NAME, json.dumps(delta).encode("utf-8"), delta_blob, project_id=BUCKET_PROJECT)
+        print(f"{log}Delta: {len(delta['added'])} added, {len(delta['removed'])} removed, "
+              f"{len(delta['relabeled'])} relabeled projects")
+    manifest = snapshot.manifest(full_export=full_export)
+    upload_bytes_to_gcs(BUCKET_NAME, json.dumps(manifest).encode("utf-8"), f"{prefix}{MANIFEST_FILE}",
+                        project_id=BUCKET_PROJECT)
+    summary["uploaded"] = True
+    summary["full_export"] = full_export
+    return summary
@@ -0,0 +1,119 @@
+import base64
+import concurrent.futures
+import threading
+import time
+
+from google.api_core import exceptions
+
+OWNER_ROLES = ("roles/owner", "roles/editor") # Roles an owner is inferred from, by priority
+MEMBER_TYPES = ("user", "group") # Member types that can be an owner, by priority
+
+
+def infer_owner(policy, roles=OWNER_ROLES, member_types=MEMBER_TYPES):
+    """Returns the probable (owner, role) of a project from its IAM policy, or (None, None).
+
+    The owner is the first member, in alphabetical order, of the highest
+    priority member type in the highest priority role. Service accounts and
+    deleted members are never picked.
+    """
+    members_by_role = {}
+    for binding in policy.bindings:
+        members_by_role.setdefault(binding.role, set()).update(binding.members)
+    for role in roles:
+        members = members_by_role.get(role, ())
+        for member_type in member_types:
+            candidates = sorted(m for m in members if m.startswith(f"{member_type}:"))
+            if candidates:
+                return candidates[0].split(":", 1)[1], role
+    return None, None
+
+
+class OwnerInference:
+    """Infers the owner of unlabeled projects from their IAM policies, concurrently.
+
+    Projects are submitted while the search results are processed and their
+    policies are fetched by a bounded thread pool. Inferences are cached by
+    project: an entry younger than `ttl_seconds` is reused without calling the
+    API, and an older one is refreshed (the policy etag tells whether it
+    changed). Once `budget_seconds` have elapsed, no new policy is fetched and
+    the last cached inference, if any, is used instead.
+
+    Args:
+        projects_client: The resourcemanager_v3.ProjectsClient to fetch policies with.
+        cache (dict, optional): The cache document saved by a previous run.
+        max_workers (int): Policies fetched concurrently.
+        ttl_seconds (int): Age under which a cached inference is reused as-is.
+        budget_seconds (int): Time after which no new policy is fetched.
+        executor (concurrent.futures.Executor, optional): A pool shared with
+            other inferences; by default, one of `max_workers` threads is created.
+    """
+
+    def __init__(self, projects_client, cache=None, max_workers=32, ttl_seconds=86400, budget_seconds=120,
+                 executor=None):
+        self.projects_client = projects_client
+        self.ttl_seconds = ttl_seconds
+        self.deadline = time.monotonic() + budget_seconds
+        self.previous = (cache or {}).get("projects", {})
+        self.cache = {}
+        self.stats = {"cached": 0, "fetched": 0, "unchanged": 0, "stale": 0, "skipped": 0, "failed": 0}
+        self._lock = threading.Lock()
+        self._own_executor = executor is None
+        self._executor = executor or concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        self._pending = []
+
+    def submit(self, project_info, destination):
+        """Schedules the owner inference of an exported project record.
+
+        The record and its destination are returned by results() once enriched.
+        """
+        future = self._executor.submit(self._infer, project_info["Project Number"])
+        self._pending.append((project_info, destination, future))
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _infer(self, project_name):
+        """Returns the cache entry of a project, fetching its policy if needed."""
+        cached = self.previous.get(project_name)
+        now = time.time()
+        if cached and now - cached["checked"] < self.ttl_seconds:
+            self._count("cached")
+            return cached
+        if time.monotonic() > self.deadline:
+            self._count("stale" if cached else "skipped")
+            return cached
+
+        try:
+            policy = self.projects_client.get_iam_policy(resource=project_name)
+        except exceptions.GoogleAPIError as e:
+            self._count("failed")
+            return dict(cached, error=str(e)) if cached else {"error": str(e)}
+        etag = base64.b64encode(policy.etag).decode("ascii")
+        self._count("fetched")
+        if cached and cached.get("etag") == etag:
+            self._count("unchanged")
+            return dict(cached, checked=now)
+        owner, role = infer_owner(policy)
+        return {"etag": etag, "owner": owner, "role": role, "checked": now}
+
+    def results(self):
+        """Yields (project_info, destination) pairs in submission order, with the inferred owner attached."""
+        for project_info, destination, future in self._pending:
+            entry = future.result()
+            if entry is not None:
+                if "checked" in entry:
+                    self.cache[project_info["Project Number"]] = {
+                        key: value for key, value in entry.items() if key != "error"
+                    }
+                if entry.get("owner"):
+                    project_info["Inferred Owner"] = entry["owner"]
+                    project_info["Inferred Owner Role"] = entry["role"]
+            yield project_info, destination
+        self._pending = []
+        if self._own_executor:
+            self._executor.shutdown(wait=True)
+
+    def cache_document(self):
+        """Returns the cache to save for the next run (only the projects seen in this run)."""
+        return {"projects": self.cache}
@@ -0,0 +1,116 @@
+import hashlib
+import json
+from datetime import datetime, timezone
+
+
+def record_fingerprint(record):
+    """Returns a stable hash of an exported project record."""
+    payload = json.dumps(record, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class ProjectSnapshot:
+    """Tracks the fingerprint of every exported project and compares it to the last run.
+
+    The manifest of the previous run (project ID -> fingerprint) is loaded
+    before processing, so each record is classified as added, relabeled or
+    unchanged as soon as it is seen; only added and relabeled records are kept,
+    and none without a previous manifest (there is no delta to publish then).
+    The manifest also records when the full exports were last rewritten, so
+    runs in between only publish a delta.
+
+    Args:
+        previous_manifest (dict, optional): The manifest written by the previous
+            run, or None on the first run.
+        rules (str, optional): Fingerprint of the label rules the exports are
+            evaluated with; a rule change invalidates the previous snapshot.
+    """
+
+    def __init__(self, previous_manifest=None, rules=None):
+        self.previous_manifest = previous_manifest
+        self.rules = rules
+        self.previous = (previous_manifest or {}).get("projects", {})
+        self.fingerprints = {}
+        self.added = []
+        self.relabeled = []
+
+    def add(self, record):
+        """Fingerprints one exported project record."""
+        project_id = record["Project ID"]
+        fingerprint = record_fingerprint(record)
+        self.fingerprints[project_id] = fingerprint
+        if self.previous_manifest is None:
+            return
+        previous = self.previous.get(project_id)
+        if previous is None:
+            self.added.append(record)
+        elif previous != fingerprint:
+            self.relabeled.append(record)
+
+    def removed(self):
+        """Returns the IDs of the projects exported last run but not this run."""
+        return sorted(set(self.previous) - set(self.fingerprints))
+
+    def snapshot_hash(self):
+        """Returns a hash of the whole snapshot, independent of project order."""
+        digest = hashlib.sha256()
+        for project_id, fingerprint in sorted(self.fingerprints.items()):
+            digest.update(f"{project_id}={fingerprint}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+    def changed(self):
+        """Returns True if anything changed since the previous run (or there is none)."""
+        if self.previous_manifest is None or self.previous_manifest.get("rules") != self.rules:
+            return True
+        return self.snapshot_hash() != self.previous_manifest.get("snapshot")
+
+    def change_count(self):
+        """Returns the number of added, removed and relabeled projects."""
+        return len(self.added) + len(self.relabeled) + len(self.removed())
+
+    def needs_full_export(self, max_delta_ratio, max_age_seconds, now=None):
+        """Returns True if the full exports must be rewritten, not only a delta published.
+
+        That is the case on the first run, after a rule change, when more than
+        max_delta_ratio of the projects changed, or when the last full export
+        is older than max_age_seconds.
+        """
+        if self.previous_manifest is None or self.previous_manifest.get("rules") != self.rules:
+            return True
+        full_export = self.previous_manifest.get("full_export")
+        if not full_export:  # Manifest written before full exports were tracked
+            return True
+        if self.change_count() > max_delta_ratio * max(1, len(self.fingerprints)):
+            return True
+        age = (now or datetime.now(timezone.utc)) - datetime.fromisoformat(full_export["generated"])
+        return age.total_seconds() > max_age_seconds
+
+    def manifest(self, full_export=False):
+        """Returns the manifest to store next to the exports.
+
+        With full_export, the full exports were rewritten by this run;
+        otherwise the previous manifest's full export is carried over.
+        """
+        generated = datetime.now(timezone.utc).isoformat()
+        if full_export:
+            last_full_export = {"generated": generated, "snapshot": self.snapshot_hash()}
+        else:
+            last_full_export = (self.previous_manifest or {}).get("full_export")
+        return {
+            "generated": generated,
+            "snapshot": self.snapshot_hash(),
+            "rules": self.rules,
+            "full_export": last_full_export,
+            "projects": self.fingerprints,
+        }
+
+    def delta(self):
+        """Returns the added, removed and relabeled projects since the previous run."""
+        return {
+            "generated": datetime.now(timezone.utc).isoformat(),
+            "previous_snapshot": (self.previous_manifest or {}).get("snapshot"),
+            "snapshot": self.snapshot_hash(),
+            "added": self.added,
+            "removed": self.removed(),
+            "relabeled": self.relabeled,
+        }
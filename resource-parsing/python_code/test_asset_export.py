@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Offline checks of the Cloud Asset Inventory export reader on fixture files (no GCP access needed)
+"""
+import gzip
+import json
+import os
+import sys
+import tempfile
+from asset_export import iter_export_pages, iter_export_projects, parse_project_asset
+
+PROJECT_TYPE = "cloudresourcemanager.googleapis.com/Project"
+
+# Fixture export lines: v1 and v3 project resource data, a deleted project and another asset type
+ASSETS = [
+    {"name": "//cloudresourcemanager.googleapis.com/projects/111", "asset_type": PROJECT_TYPE,
+     "ancestors": ["projects/111", "folders/10", "organizations/1"],
+     "resource": {"data": {"projectNumber": "111", "projectId": "prj-a", "name": "Project A",
+                           "lifecycleState": "ACTIVE", "labels": {"owner": "team-a"},
+                           "parent": {"type": "folder", "id": "10"}}}},
+    {"name": "//cloudresourcemanager.googleapis.com/projects/222", "assetType": PROJECT_TYPE,
+     "ancestors": ["projects/222", "organizations/1"],
+     "resource": {"data": {"name": "projects/222", "projectId": "prj-b", "displayName": "Project B",
+                           "state": "ACTIVE", "parent": "organizations/1"}}},
+    {"name": "//cloudresourcemanager.googleapis.com/projects/333", "asset_type": PROJECT_TYPE,
+     "ancestors": ["projects/333", "folders/10", "organizations/1"],
+     "resource": {"data": {"projectNumber": "333", "projectId": "prj-c", "lifecycleState": "DELETE_REQUESTED"}}},
+    {"name": "//storage.googleapis.com/bucket", "asset_type": "storage.googleapis.com/Bucket",
+     "resource": {"data": {"name": "bucket"}}},
+]
+
+def write_export(directory, name, opener=open):
+    """Write the fixture export as newline-delimited JSON, returns its path."""
+    path = os.path.join(directory, name)
+    with opener(path, "wt") as f:
+        f.writelines(json.dumps(asset) + "\n" for asset in ASSETS)
+    return path
+
+def test_parse_v1_and_v3():
+    """Both Resource Manager resource data formats give the same project fields."""
+    a = parse_project_asset(ASSETS[0])
+    b = parse_project_asset(ASSETS[1])
+    assert (a.name, a.project_id, a.display_name, a.labels, a.parent) == (
+        "projects/111", "prj-a", "Project A", {"owner": "team-a"}, "folders/10")
+    assert (b.name, b.project_id, b.display_name, b.labels, b.parent) == (
+        "projects/222", "prj-b", "Project B", {}, "organizations/1")
+
+def test_skipped_assets():
+    """Inactive projects and other asset types are skipped."""
+    assert parse_project_asset(ASSETS[2]) is None
+    assert parse_project_asset(ASSETS[3]) is None
+
+def test_read_files():
+    """Plain and gzip exports stream the same active projects, optionally scoped to a folder."""
+    with tempfile.TemporaryDirectory() as directory:
+        plain = write_export(directory, "export.json")
+        compressed = write_export(directory, "export.json.gz", gzip.open)
+        assert [p.project_id for p in iter_export_projects(plain)] == ["prj-a", "prj-b"]
+        assert [p.project_id for p in iter_export_projects(compressed)] == ["prj-a", "prj-b"]
+        assert [p.project_id for p in iter_export_projects(plain, scope="folders/10")] == ["prj-a"]
+
+def test_pages():
+    """Pages hold page_size projects, the last one the rest."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = write_export(directory, "export.json")
+        pages = [[p.project_id for p in page] for page in iter_export_pages(path, 1)]
+    assert pages == [["prj-a"], ["prj-b"]]
+
+if __name__ == "__main__":
+    tests = [test_parse_v1_and_v3, test_skipped_assets, test_read_files, test_pages]
+    failures = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failures else 0)
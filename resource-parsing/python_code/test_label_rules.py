@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Offline checks of the label rule evaluation on fixture projects (no GCP access needed)
+"""
+import sys
+from label_rules import LabelRuleError, LabelRuleResults, LabelRuleSet
+
+# Fixture rule file
+RULES = [
+    {"name": "owner", "type": "required", "key": "owner"},
+    {"name": "env-values", "type": "allowed_values", "key": "env", "pattern": "dev|prod"},
+    {"name": "env-required", "type": "allowed_values", "key": "env", "pattern": "dev|prod", "required": True},
+    {"name": "prod-cost-center", "type": "dependency",
+     "if": {"key": "env", "pattern": "prod"}, "then": {"key": "cost-center", "pattern": "[0-9]{4}"}},
+]
+RULE_SET = LabelRuleSet(RULES)
+
+def failed(labels):
+    """Names of the rules failed by a project's labels."""
+    return RULE_SET.failed_rules(RULE_SET.evaluate(labels))
+
+def test_compliant():
+    """A project passing every rule has an empty failed rules bitmask."""
+    assert RULE_SET.evaluate({"owner": "team-a", "env": "dev"}) == 0
+
+def test_required_and_allowed_values():
+    """Missing labels only fail required rules; present labels must match the whole pattern."""
+    assert failed({}) == ["owner", "env-required"]
+    assert failed({"owner": "team-a", "env": "production"}) == ["env-values", "env-required"]
+
+def test_dependency():
+    """A dependency only fails when its condition holds and the dependent label does not match."""
+    assert failed({"owner": "team-a", "env": "prod"}) == ["prod-cost-center"]
+    assert failed({"owner": "team-a", "env": "prod", "cost-center": "12"}) == ["prod-cost-center"]
+    assert failed({"owner": "team-a", "env": "prod", "cost-center": "1234"}) == []
+    assert failed({"owner": "team-a", "env": "dev", "cost-center": "12"}) == []
+
+def test_cached_values():
+    """Cached label values give the same result as the first evaluation."""
+    labels = {"env": "prod", "cost-center": "1234"}
+    assert RULE_SET.evaluate(labels) == RULE_SET.evaluate(dict(labels)) == RULE_SET.evaluate(labels)
+
+def test_invalid_rules():
+    """Unknown types, invalid patterns and unnamed rules are rejected when the rules are loaded."""
+    for rules in ([{"name": "x", "type": "unknown"}],
+                  [{"name": "x", "type": "allowed_values", "key": "env", "pattern": "("}],
+                  [{"type": "required", "key": "owner"}],
+                  [RULES[0], RULES[0]]):
+        try:
+            LabelRuleSet(rules)
+        except LabelRuleError:
+            continue
+        raise AssertionError(f"accepted {rules}")
+
+def test_results_report():
+    """Per-rule counters and buckets add up to the number of recorded projects."""
+    results = LabelRuleResults(RULE_SET)
+    for project_id, labels in [("prj-b", {}), ("prj-a", {"owner": "team-a", "env": "dev"}),
+                               ("prj-c", {"owner": "team-a", "env": "prod"})]:
+        results.record(project_id, RULE_SET.evaluate(labels))
+    report = {entry["Rule"]: entry for entry in results.report()}
+    assert results.compliant == 1
+    assert results.counters()["owner"] == {"passed": 2, "failed": 1}
+    assert report["owner"]["Failed Projects"] == ["prj-b"]
+    assert report["prod-cost-center"]["Passed Projects"] == ["prj-a", "prj-b"]
+
+if __name__ == "__main__":
+    tests = [test_compliant, test_required_and_allowed_values, test_dependency, test_cached_values,
+             test_invalid_rules, test_results_report]
+    failures = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Offline checks of the project snapshot, its manifest and delta (no GCP access needed)
+"""
+import sys
+from datetime import datetime, timedelta, timezone
+from snapshot import ProjectSnapshot
+
+def record(project_id, owner="team-a"):
+    """A project record as exported by main.py."""
+    return {"Project ID": project_id, "Project Name": project_id.upper(), "Labels": {"owner": owner}}
+
+DAY_1 = [record("prj-a"), record("prj-b"), record("prj-c")]
+
+def run(records, previous_manifest=None, rules="rules-1"):
+    """Snapshot of one run."""
+    snapshot = ProjectSnapshot(previous_manifest, rules)
+    for r in records:
+        snapshot.add(r)
+    return snapshot
+
+def test_first_run():
+    """Without a previous manifest, everything is new and nothing is kept for a delta."""
+    snapshot = run(DAY_1)
+    assert snapshot.changed()
+    assert snapshot.needs_full_export(0.1, 3600)
+    assert (snapshot.added, snapshot.relabeled) == ([], [])
+
+def test_unchanged():
+    """The same projects in another order give the same snapshot."""
+    manifest = run(DAY_1).manifest(full_export=True)
+    snapshot = run(list(reversed(DAY_1)), manifest)
+    assert not snapshot.changed()
+    assert snapshot.change_count() == 0
+    assert snapshot.manifest()["full_export"] == manifest["full_export"]
+
+def test_delta():
+    """Added, removed and relabeled projects are classified against the previous manifest."""
+    manifest = run(DAY_1).manifest(full_export=True)
+    snapshot = run([record("prj-a"), record("prj-b", owner="team-b"), record("prj-d")], manifest)
+    delta = snapshot.delta()
+    assert [r["Project ID"] for r in delta["added"]] == ["prj-d"]
+    assert [r["Project ID"] for r in delta["relabeled"]] == ["prj-b"]
+    assert delta["removed"] == ["prj-c"]
+    assert delta["previous_snapshot"] == manifest["snapshot"]
+
+def test_full_export_thresholds():
+    """Full exports are rewritten after a rule change, a large delta or when the last one is too old."""
+    manifest = run(DAY_1).manifest(full_export=True)
+    one_change = [record("prj-a"), record("prj-b"), record("prj-c", owner="team-b")]
+    assert not run(one_change, manifest).needs_full_export(0.5, 3600)
+    assert run(one_change, manifest).needs_full_export(0.1, 3600)
+    assert run(one_change, manifest, rules="rules-2").needs_full_export(0.5, 3600)
+    later = datetime.now(timezone.utc) + timedelta(hours=2)
+    assert run(one_change, manifest).needs_full_export(0.5, 3600, now=later)
+
+if __name__ == "__main__":
+    tests = [test_first_run, test_unchanged, test_delta, test_full_export_thresholds]
+    failures = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failures else 0)
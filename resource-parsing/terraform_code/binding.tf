@@ -4,6 +4,13 @@ resource "google_project_iam_member" "monitoring_binding_writer" {
   member  = "serviceAccount:${local.sa_functions}"
 }
 
+# Owner inference (INFER_OWNERS) reads the IAM policy of every project
+resource "google_organization_iam_member" "function_security_reviewer" {
+  org_id = local.org_id
+  role   = "roles/iam.securityReviewer"
+  member = "serviceAccount:${local.sa_functions}"
+}
+
 resource "google_project_iam_member" "tooling_function_invoker" {
   project = local.tooling_project
   role    = "roles/cloudfunctions.serviceAgent"
@@ -4,5 +4,6 @@ locals{
   sa_functions="sa-xxxxx@<prjname>.iam.gserviceaccount.com"  #  FORMAT = sa@<proj>.iam - Service account email
   monitoring_project="example-here" #  FORMAT = PROJECT-ID
   cloud_build_sa="sa-xxxxx@<prjname>.iam.gserviceaccount.com"  #  FORMAT = sa@<proj>.iam - Service account email
+  org_id="123456789012"  #  FORMAT = organization ID (numeric)
 
 }
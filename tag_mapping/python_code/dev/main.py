@@ -1,10 +1,17 @@
+import collections
+import gzip
 import json
 import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 import pytz
 from google.cloud import resourcemanager_v3, bigquery
 from google.cloud.exceptions import NotFound
 from google.api_core import exceptions
+from tag_intervals import diff_tag_intervals
 
 # Import functions_framework only when running in Cloud Function
 try:
@@ -34,6 +41,24 @@ BQ_PROJECT_ID = get_config('BQ_PROJECT_ID', 'your-bigquery-project-id')
 BQ_DATASET = get_config('BQ_DATASET', 'billing_data')
 BQ_TABLE_PROJECTS = get_config('BQ_TABLE_PROJECTS', 'projects_with_tags')
 BQ_TABLE_TAGS = get_config('BQ_TABLE_TAGS', 'project_tags')
+BQ_TABLE_TAG_INTERVALS = get_config('BQ_TABLE_TAG_INTERVALS', 'project_tag_intervals')
+BQ_VIEW_CURRENT_TAGS = get_config('BQ_VIEW_CURRENT_TAGS', 'project_tags_current')
+# 'snapshot': every tag of every project in the daily partition of BQ_TABLE_TAGS,
+# 'intervals': only the validity intervals of tag assignments in BQ_TABLE_TAG_INTERVALS (see tag_intervals.py)
+TAG_EXPORT_MODE = get_config('TAG_EXPORT_MODE', 'snapshot')
+# Local directory or gs://bucket/prefix where collection progress is saved, so a run stopped by the
+# function timeout resumes on the next invocation of the same day (disabled when unset)
+CHECKPOINT_URI = get_config('CHECKPOINT_URI', None)
+CHECKPOINT_INTERVAL_SECONDS = int(get_config('CHECKPOINT_INTERVAL_SECONDS', 60))
+# 'effective': one ListEffectiveTags call per project (child bindings override their parents),
+# 'hierarchy': union of the tag bindings of the project and all its ancestors
+TAG_COLLECTION_MODE = get_config('TAG_COLLECTION_MODE', 'effective')
+# Daily partitions older than this are dropped by BigQuery
+PARTITION_EXPIRATION_DAYS = int(get_config('PARTITION_EXPIRATION_DAYS', 365))
+# Projects processed concurrently, and Resource Manager read calls allowed per second across all
+# of them (the default read quota is 1,500 requests per minute, this leaves room for other callers)
+MAX_WORKERS = int(get_config('MAX_WORKERS', 16))
+RM_READS_PER_SECOND = float(get_config('RM_READS_PER_SECOND', 20))
 
 # Initialize clients
 projects_client = resourcemanager_v3.ProjectsClient()
@@ -44,35 +69,173 @@ tag_values_client = resourcemanager_v3.TagValuesClient()
 tag_bindings_client = resourcemanager_v3.TagBindingsClient()
 bq_client = bigquery.Client(project=BQ_PROJECT_ID)
 
-# Cache for tag details
+class TokenBucket:
+    """Thread-safe token bucket: `rate` calls per second on average, in bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a call is allowed."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+# Shared by every Resource Manager read call of the worker pool
+rm_rate_limiter = TokenBucket(RM_READS_PER_SECOND)
+
+def list_all(list_method, request, field):
+    """Yield the items of a paged list call, taking a rate limiter token before each page request.
+
+    The pager fetches the first page when it is created and each next page
+    only once the previous one is exhausted, so iterating it directly would
+    send every page after the first without a token.
+    """
+    rm_rate_limiter.acquire()
+    pages = list_method(request=request).pages
+    page = next(pages)
+    while True:
+        yield from getattr(page, field)
+        if not page.next_page_token:
+            return
+        rm_rate_limiter.acquire()
+        page = next(pages)
+
+# Lookups in progress, so that concurrent workers needing the same entry wait for one call
+cache_lock = threading.Lock()
+cache_in_flight = {}
+
+def cached_call(cache, key, compute, cache_none=True):
+    """Return cache[key], computing it once even when several workers ask for it at the same time.
+
+    A None result is not cached when `cache_none` is False: the next caller
+    tries again, as a failed lookup did before the pool was introduced.
+    """
+    while True:
+        with cache_lock:
+            if key in cache:
+                return cache[key]
+            event = cache_in_flight.get((id(cache), key))
+            owner = event is None
+            if owner:
+                event = cache_in_flight[(id(cache), key)] = threading.Event()
+        if not owner:
+            event.wait()
+            continue
+
+        try:
+            value = compute()
+            if value is not None or cache_none:
+                with cache_lock:
+                    cache[key] = value
+            return value
+        finally:
+            with cache_lock:
+                del cache_in_flight[(id(cache), key)]
+            event.set()
+
+# Caches for tag details (Key:Value by tag value name) and tag key short names
 tag_details_cache = {}
+tag_keys_cache = {}
 
-def get_tag_details(tag_value_name):
-    """Retrieve and cache formatted tag details (Key:Value)."""
-    if tag_value_name in tag_details_cache:
-        return tag_details_cache[tag_value_name]
+def fetch_tag_key_short_name(tag_key_name):
+    """Retrieve the short name of a tag key."""
+    try:
+        request = resourcemanager_v3.GetTagKeyRequest(name=tag_key_name)
+        rm_rate_limiter.acquire()
+        return tag_keys_client.get_tag_key(request=request).short_name
+    except exceptions.GoogleAPICallError as e:
+        print(f"Error getting tag key {tag_key_name}: {e}")
+        return None
 
+def get_tag_key_short_name(tag_key_name):
+    """Retrieve and cache the short name of a tag key."""
+    return cached_call(tag_keys_cache, tag_key_name,
+                       lambda: fetch_tag_key_short_name(tag_key_name), cache_none=False)
+
+def fetch_tag_details(tag_value_name):
+    """Retrieve formatted tag details (Key:Value)."""
     try:
         # Get tag value details
         request = resourcemanager_v3.GetTagValueRequest(name=tag_value_name)
+        rm_rate_limiter.acquire()
         value_details = tag_values_client.get_tag_value(request=request)
-        
-        # Get tag key details
-        key_request = resourcemanager_v3.GetTagKeyRequest(name=value_details.parent)
-        key_details = tag_keys_client.get_tag_key(request=key_request)
-        
-        formatted_name = f"{key_details.short_name}:{value_details.short_name}"
-        tag_details_cache[tag_value_name] = formatted_name
-        return formatted_name
     except exceptions.GoogleAPICallError as e:
         print(f"Error getting tag details for {tag_value_name}: {e}")
         return None
 
+    # Get tag key details (usually prefetched)
+    key_short_name = get_tag_key_short_name(value_details.parent)
+    if key_short_name is None:
+        return None
+    return f"{key_short_name}:{value_details.short_name}"
+
+def get_tag_details(tag_value_name):
+    """Retrieve and cache formatted tag details (Key:Value), fetched once per tag value."""
+    return cached_call(tag_details_cache, tag_value_name,
+                       lambda: fetch_tag_details(tag_value_name), cache_none=False)
+
+def prefetch_tag_values(tag_key):
+    """Cache the Key:Value names of every value of a tag key, returns the number of values."""
+    try:
+        request = resourcemanager_v3.ListTagValuesRequest(parent=tag_key.name)
+        count = 0
+        for value in list_all(tag_values_client.list_tag_values, request, 'tag_values'):
+            tag_details_cache[value.name] = f"{tag_key.short_name}:{value.short_name}"
+            count += 1
+        return count
+    except exceptions.GoogleAPICallError as e:
+        print(f"Error listing the values of tag key {tag_key.namespaced_name or tag_key.name}: {e}")
+        return 0
+
+def prefetch_tag_details():
+    """List every tag key of the organization and their values into the caches.
+
+    Runs before the first hierarchy walk of a run, so most bindings are
+    resolved without any lookup; values owned by another organization or by a
+    project are still fetched one by one when met.
+    """
+    parent = f"organizations/{ORG_ID}"
+    try:
+        request = resourcemanager_v3.ListTagKeysRequest(parent=parent)
+        tag_keys = list(list_all(tag_keys_client.list_tag_keys, request, 'tag_keys'))
+    except exceptions.GoogleAPICallError as e:
+        print(f"Error listing the tag keys of {parent}, tag values will be fetched when met: {e}")
+        return
+
+    for tag_key in tag_keys:
+        tag_keys_cache[tag_key.name] = tag_key.short_name
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        values_count = sum(executor.map(prefetch_tag_values, tag_keys))
+    print(f"Prefetched {len(tag_keys)} tag keys and {values_count} tag values of {parent}")
+
+# Organizations whose tags were prefetched in the current run (reset by collect_project_data)
+tag_prefetch_cache = {}
+
+def ensure_tag_details_prefetched():
+    """Prefetch the organization's tags once per run, the first time bindings have to be resolved.
+
+    Effective tags come with their names, so runs that never walk the
+    hierarchy don't list any tag key or value.
+    """
+    cached_call(tag_prefetch_cache, ORG_ID, lambda: prefetch_tag_details() or True)
+
 def get_tags_for_resource(resource_name):
     """Retrieve formatted tags for a given resource."""
     try:
         request = resourcemanager_v3.ListTagBindingsRequest(parent=resource_name)
-        bindings = tag_bindings_client.list_tag_bindings(request=request)
+        bindings = list_all(tag_bindings_client.list_tag_bindings, request, 'tag_bindings')
         
         tags = set()
         for binding in bindings:
@@ -86,6 +249,123 @@ def get_tags_for_resource(resource_name):
         print(f"Error getting tags for resource {resource_name}: {e}")
         return set()
 
+# Per-run caches of the resource hierarchy (reset by collect_project_data)
+folder_parent_cache = {}
+container_tags_cache = {}
+
+def fetch_folder_parent(folder_name):
+    """Retrieve the parent of a folder (None if the folder can't be read)."""
+    try:
+        request = resourcemanager_v3.GetFolderRequest(name=folder_name)
+        rm_rate_limiter.acquire()
+        return folders_client.get_folder(request=request).parent
+    except exceptions.GoogleAPICallError as e:
+        print(f"Error getting folder {folder_name}: {e}")
+        return None
+
+def get_folder_parent(folder_name):
+    """Retrieve and cache the parent of a folder (None if the folder can't be read)."""
+    return cached_call(folder_parent_cache, folder_name, lambda: fetch_folder_parent(folder_name))
+
+def get_container_tags(container_name):
+    """Retrieve and cache the tags of a folder or organization, merged with its ancestors' tags.
+
+    Each folder and organization is resolved once per run: sibling projects
+    reuse the merged tag set of their common ancestors.
+    """
+    def compute():
+        tags = get_tags_for_resource(f"//cloudresourcemanager.googleapis.com/{container_name}")
+        if container_name.startswith('folders/'):
+            parent = get_folder_parent(container_name)
+            if parent and parent.startswith(('folders/', 'organizations/')):
+                tags |= get_container_tags(parent)
+        return frozenset(tags)
+
+    return cached_call(container_tags_cache, container_name, compute)
+
+def get_hierarchy_tags(project):
+    """Retrieve a project's tags merged with the cached tags of its ancestors."""
+    ensure_tag_details_prefetched()
+    project_number = project.name.split('/')[-1]
+
+    # Direct project tags
+    resource_name = f"//cloudresourcemanager.googleapis.com/projects/{project_number}"
+    tags = get_tags_for_resource(resource_name)
+
+    # The parent comes with the search results, fetch the project only if it is missing
+    parent = project.parent
+    if not parent:
+        try:
+            request = resourcemanager_v3.GetProjectRequest(name=project.name)
+            rm_rate_limiter.acquire()
+            parent = projects_client.get_project(request=request).parent
+        except exceptions.GoogleAPICallError as e:
+            print(f"Error processing project {project.project_id}: {e}")
+            # If we can't get ancestors, keep the direct project tags
+
+    if parent and parent.startswith(('folders/', 'organizations/')):
+        tags |= get_container_tags(parent)
+    return tags
+
+def format_effective_tag(effective_tag):
+    """Format an effective tag as Key:Value from its namespaced names, without extra lookups."""
+    # namespaced_tag_value is "{parent id}/{key short name}/{value short name}"
+    parts = effective_tag.namespaced_tag_value.split('/')
+    if len(parts) == 3:
+        formatted_name = f"{parts[1]}:{parts[2]}"
+        tag_details_cache.setdefault(effective_tag.tag_value, formatted_name)
+        return formatted_name
+    return get_tag_details(effective_tag.tag_value)
+
+def get_effective_tags(project):
+    """Retrieve the effective tags of a project (own and inherited) in one listing call.
+
+    Returns None if they can't be listed, so the caller can fall back to the
+    hierarchy walk.
+    """
+    resource_name = f"//cloudresourcemanager.googleapis.com/{project.name}"
+    try:
+        request = resourcemanager_v3.ListEffectiveTagsRequest(parent=resource_name)
+        tags = set()
+        for effective_tag in list_all(tag_bindings_client.list_effective_tags, request, 'effective_tags'):
+            formatted_tag = format_effective_tag(effective_tag)
+            if formatted_tag:
+                tags.add(formatted_tag)
+        return tags
+    except exceptions.GoogleAPICallError as e:
+        print(f"Error getting effective tags for {project.project_id}, walking the hierarchy instead: {e}")
+        return None
+
+def map_in_order(executor, fn, items, window):
+    """Like executor.map, with at most `window` tasks submitted ahead of the consumer.
+
+    executor.map submits every task up front and keeps all their results
+    until they are consumed; this keeps memory bounded on large organizations.
+    """
+    pending = collections.deque()
+    for item in items:
+        if len(pending) >= window:
+            yield pending.popleft().result()
+        pending.append(executor.submit(fn, item))
+    while pending:
+        yield pending.popleft().result()
+
+def collect_project_tags(project):
+    """Collect the tags of one project, on a worker of the pool (None if the project is not exported)."""
+    lifecycle_state = project.state.name if hasattr(project.state, 'name') else str(project.state)
+    # Only ACTIVE projects are exported, skip the tag lookups of the others
+    if not project.name.split('/')[-1] or lifecycle_state != 'ACTIVE':
+        return None
+
+    # Effective tags in one call, or the project and ancestors' tags as a fallback
+    effective_tags = None
+    if TAG_COLLECTION_MODE == 'effective':
+        effective_tags = get_effective_tags(project)
+    if effective_tags is None:
+        effective_tags = get_hierarchy_tags(project)
+    # Sorted, so the exported rows don't depend on set order or worker scheduling
+    return sorted(effective_tags)
+
 def create_projects_table_schema():
     """Define BigQuery schema for projects table."""
     return [
@@ -110,152 +390,403 @@ def create_tags_table_schema():
         bigquery.SchemaField("export_date", "DATE", mode="REQUIRED"),
     ]
 
+def create_tag_intervals_table_schema():
+    """Define BigQuery schema for the tag assignment intervals table."""
+    return [
+        bigquery.SchemaField("project_id", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("project_number", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("tag_key", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("tag_value", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("tag_full", "STRING", mode="REQUIRED"),
+        bigquery.SchemaField("valid_from", "DATE", mode="REQUIRED"),
+        bigquery.SchemaField("valid_to", "DATE", mode="NULLABLE"),  # NULL while the tag is assigned
+    ]
+
+def create_view_if_not_exists(view_id, query):
+    """Create BigQuery view if it doesn't exist."""
+    view_ref = bq_client.dataset(BQ_DATASET).table(view_id)
+
+    try:
+        bq_client.get_table(view_ref)
+        print(f"View {BQ_DATASET}.{view_id} already exists")
+    except NotFound:
+        view = bigquery.Table(view_ref)
+        view.view_query = query
+        bq_client.create_table(view)
+        print(f"Created view {BQ_DATASET}.{view_id}")
+
 def create_table_if_not_exists(table_id, schema, partition_field=None):
-    """Create BigQuery table if it doesn't exist."""
+    """Create BigQuery table if it doesn't exist, with partitions expiring after PARTITION_EXPIRATION_DAYS."""
     table_ref = bq_client.dataset(BQ_DATASET).table(table_id)
+    expiration_ms = PARTITION_EXPIRATION_DAYS * 24 * 60 * 60 * 1000 if partition_field else None
     
     try:
-        bq_client.get_table(table_ref)
+        table = bq_client.get_table(table_ref)
         print(f"Table {BQ_DATASET}.{table_id} already exists")
+
+        # Tables created before partition expiration was used keep their data until it is set
+        if table.time_partitioning and table.time_partitioning.expiration_ms != expiration_ms:
+            table.time_partitioning.expiration_ms = expiration_ms
+            bq_client.update_table(table, ["time_partitioning"])
+            print(f"Set partition expiration of {BQ_DATASET}.{table_id} to {PARTITION_EXPIRATION_DAYS} days")
     except NotFound:
         table = bigquery.Table(table_ref, schema=schema)
         
         if partition_field:
             table.time_partitioning = bigquery.TimePartitioning(
                 type_=bigquery.TimePartitioningType.DAY,
-                field=partition_field
+                field=partition_field,
+                expiration_ms=expiration_ms
             )
             table.clustering_fields = ["project_id"]
         
         table = bq_client.create_table(table)
         print(f"Created table {BQ_DATASET}.{table_id}")
 
+def checkpoint_location(export_date, suffix='.json'):
+    """Return (bucket, object name) for gs:// checkpoints, or (None, local path)."""
+    file_name = f"tags_checkpoint_{export_date}{suffix}"
+    if CHECKPOINT_URI.startswith('gs://'):
+        bucket_name, _, prefix = CHECKPOINT_URI[len('gs://'):].partition('/')
+        return bucket_name, f"{prefix.rstrip('/')}/{file_name}" if prefix else file_name
+    return None, os.path.join(CHECKPOINT_URI, file_name)
+
+def segment_suffix(index):
+    """Suffix of the checkpoint segment holding the rows of the index-th checkpoint."""
+    return f".{index:05d}.ndjson.gz"
+
+storage_client_cache = {}
+
+def checkpoint_blob(bucket_name, blob_name):
+    # Only needed for gs:// checkpoints, the client is created once
+    from google.cloud import storage
+    client = cached_call(storage_client_cache, BQ_PROJECT_ID, lambda: storage.Client(project=BQ_PROJECT_ID))
+    return client.bucket(bucket_name).blob(blob_name)
+
+def read_checkpoint_object(export_date, suffix='.json'):
+    """Return the content of a checkpoint object of an export date, or None if there is none."""
+    bucket_name, path = checkpoint_location(export_date, suffix)
+    try:
+        if bucket_name:
+            return checkpoint_blob(bucket_name, path).download_as_bytes()
+        with open(path, 'rb') as f:
+            return f.read()
+    except (NotFound, FileNotFoundError):
+        return None
+
+def write_checkpoint_object(export_date, data, suffix='.json'):
+    """Save a checkpoint object of an export date (replacing the previous one)."""
+    bucket_name, path = checkpoint_location(export_date, suffix)
+    if bucket_name:
+        checkpoint_blob(bucket_name, path).upload_from_string(data, content_type='application/octet-stream')
+    else:
+        os.makedirs(CHECKPOINT_URI, exist_ok=True)
+        # Written aside then renamed, so a timeout while writing doesn't corrupt the last checkpoint
+        with open(f"{path}.tmp", 'wb') as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+
+def delete_checkpoint_object(export_date, suffix='.json'):
+    bucket_name, path = checkpoint_location(export_date, suffix)
+    try:
+        if bucket_name:
+            checkpoint_blob(bucket_name, path).delete()
+        else:
+            os.remove(path)
+    except (NotFound, FileNotFoundError):
+        pass
+
+def read_checkpoint(export_date):
+    """Load the checkpoint of an export date, or None if there is none."""
+    data = read_checkpoint_object(export_date)
+    return json.loads(data) if data is not None else None
+
+def write_checkpoint(export_date, checkpoint):
+    """Save the checkpoint of an export date (replacing the previous one)."""
+    write_checkpoint_object(export_date, json.dumps(checkpoint, separators=(',', ':')).encode('utf-8'))
+
+def delete_checkpoint(export_date):
+    """Remove the checkpoint of an export date and its segments once its data is uploaded."""
+    checkpoint = read_checkpoint(export_date)
+    for index in range(checkpoint['segments'] if checkpoint else 0):
+        delete_checkpoint_object(export_date, segment_suffix(index))
+    delete_checkpoint_object(export_date)
+
+def save_progress(export_date, export_time, segment, segments, finished=False):
+    """Checkpoint the projects staged since the last checkpoint, and the hierarchy and tag caches.
+
+    The staged rows of those projects are saved as a new segment; the
+    checkpoint itself only records the number of segments, so its size
+    doesn't grow with the number of projects. Returns the number of segments.
+    """
+    if segment:
+        write_checkpoint_object(export_date.isoformat(), segment.finish().read(), segment_suffix(segments))
+        segments += 1
+    write_checkpoint(export_date.isoformat(), {
+        'export_time': export_time,
+        'finished': finished,
+        'segments': segments,
+        'tag_details': {name: tag for name, tag in dict(tag_details_cache).items() if tag},
+        'tag_keys': {name: key for name, key in dict(tag_keys_cache).items() if key},
+        'folder_parents': dict(folder_parent_cache),
+        'container_tags': {name: sorted(tags) for name, tags in dict(container_tags_cache).items()},
+    })
+    print(f"Checkpoint saved: {len(segment)} projects collected since the last one, {segments} segments")
+    return segments
+
+def restore_progress(checkpoint, export_date, projects_data, tags_data):
+    """Refill the caches from a checkpoint and stage the rows of its segments.
+
+    Returns the names of the projects already collected.
+    """
+    tag_details_cache.update(checkpoint['tag_details'])
+    tag_keys_cache.update(checkpoint['tag_keys'])
+    folder_parent_cache.update(checkpoint['folder_parents'])
+    container_tags_cache.update(
+        (name, frozenset(tags)) for name, tags in checkpoint['container_tags'].items()
+    )
+    completed = set()
+    for index in range(checkpoint['segments']):
+        # One segment in memory at a time, at most CHECKPOINT_INTERVAL_SECONDS worth of projects
+        data = read_checkpoint_object(export_date.isoformat(), segment_suffix(index))
+        for line in gzip.decompress(data).splitlines():
+            entry = json.loads(line)
+            completed.add(entry['name'])
+            projects_data.append(entry['project'])
+            for row in entry['tags']:
+                tags_data.append(row)
+    return completed
+
+class StagingTable:
+    """Rows of a BigQuery table staged on disk as gzipped NDJSON while they are collected.
+
+    Each row is serialized as soon as it is appended, so memory doesn't grow
+    with the number of projects and tags; the file is then uploaded as is by
+    a load job. Cloud Functions' /tmp is memory-backed, hence the compression
+    (tag rows are very repetitive). Iterating reads the rows back.
+
+    `export_date` is the date of the daily export the rows belong to, if any.
+    """
+
+    def __init__(self, table_id, schema, export_date=None):
+        self.table_id = table_id
+        self.schema = schema
+        self.export_date = export_date
+        self.rows = 0
+        self.file = tempfile.TemporaryFile()
+        self._writer = gzip.GzipFile(fileobj=self.file, mode='wb', compresslevel=1)
+
+    def append(self, row):
+        """Write one row (a dict of column values) to the staging file."""
+        self._writer.write(json.dumps(row, separators=(',', ':')).encode('utf-8') + b'\n')
+        self.rows += 1
+
+    def finish(self):
+        """Complete the file, no row can be appended afterwards."""
+        if not self._writer.closed:
+            self._writer.close()
+        self.file.seek(0)
+        return self.file
+
+    def __len__(self):
+        return self.rows
+
+    def __iter__(self):
+        with gzip.GzipFile(fileobj=self.finish(), mode='rb') as reader:
+            for line in reader:
+                yield json.loads(line)
+
+    def close(self):
+        self.finish()
+        self.file.close()
+
 def collect_project_data():
-    """Collect all projects and their tags."""
+    """Collect all projects and their tags into staging tables (projects, tags, total number of projects)."""
     # Use Paris timezone to match scheduler timezone
     paris_tz = pytz.timezone('Europe/Paris')
     export_time = datetime.now(timezone.utc)
     export_time_paris = export_time.astimezone(paris_tz)
     export_date = export_time_paris.date()
 
+    # Rows are written to disk as they are produced, instead of being kept as lists of dicts
+    projects_data = StagingTable(BQ_TABLE_PROJECTS, create_projects_table_schema(), export_date)
+    tags_data = StagingTable(BQ_TABLE_TAGS, create_tags_table_schema(), export_date)
+    export_date_str = export_date.isoformat()
+    export_time_str = export_time.isoformat()
+
     print("Retrieving all projects...")
     try:
         request = resourcemanager_v3.SearchProjectsRequest()
-        projects_response = projects_client.search_projects(request=request)
-        projects = list(projects_response)
+        projects = list(list_all(projects_client.search_projects, request, 'projects'))
         
         if not projects:
             print("ERROR: No projects found")
-            return [], [], 0
+            return projects_data, tags_data, 0
     except exceptions.GoogleAPICallError as e:
         print(f"ERROR: {e}")
-        return [], [], 0
+        return projects_data, tags_data, 0
 
     print(f"Processing {len(projects)} projects...")
-    
-    projects_data = []
-    tags_data = []
-    
-    for i, project in enumerate(projects):
-        project_id = project.project_id
-        project_number = project.name.split('/')[-1]
-        project_display_name = project.display_name
-        print(f"Processing ({i+1}/{len(projects)}) {project_id}")
 
-        if not project_number:
-            continue
+    # Folders and organizations are resolved, and the organization's tags prefetched, once per run
+    folder_parent_cache.clear()
+    container_tags_cache.clear()
+    tag_prefetch_cache.clear()
 
-        effective_tags = set()
-        
-        # Get project ancestors and tags
-        try:
-            request = resourcemanager_v3.GetProjectRequest(name=project.name)
-            project_details = projects_client.get_project(request=request)
-            
-            current_parent = project_details.parent
-            ancestors = [{"type": "project", "id": project_number}]
-            
-            # Traverse up the hierarchy
-            while current_parent:
-                if current_parent.startswith('folders/'):
-                    folder_id = current_parent.split('/')[-1]
-                    ancestors.append({"type": "folder", "id": folder_id})
-                    try:
-                        folder_request = resourcemanager_v3.GetFolderRequest(name=current_parent)
-                        folder = folders_client.get_folder(request=folder_request)
-                        current_parent = folder.parent
-                    except exceptions.GoogleAPICallError:
-                        break
-                elif current_parent.startswith('organizations/'):
-                    org_id = current_parent.split('/')[-1]
-                    ancestors.append({"type": "organization", "id": org_id})
-                    break
-                else:
-                    break
-            
-            # Get tags for each ancestor
-            for ancestor in ancestors:
-                resource_type = ancestor.get('type')
-                resource_id = ancestor.get('id')
-                if resource_type == 'project':
-                    resource_name = f"//cloudresourcemanager.googleapis.com/projects/{project_number}"
-                else:
-                    resource_name = f"//cloudresourcemanager.googleapis.com/{resource_type}s/{resource_id}"
-                
-                effective_tags.update(get_tags_for_resource(resource_name))
-                
-        except exceptions.GoogleAPICallError as e:
-            print(f"Error processing project {project_id}: {e}")
-            # If we can't get ancestors, still try to get direct project tags
-            resource_name = f"//cloudresourcemanager.googleapis.com/projects/{project_number}"
-            effective_tags.update(get_tags_for_resource(resource_name))
+    # Rows of the projects collected by a previous invocation of the day that didn't finish
+    completed = set()
+    segments = 0
+    checkpoint = read_checkpoint(export_date.isoformat()) if CHECKPOINT_URI else None
+    if checkpoint:
+        completed = restore_progress(checkpoint, export_date, projects_data, tags_data)
+        segments = checkpoint['segments']
+        # Same export time as the rows collected before, so the resumed export is consistent
+        export_time_str = checkpoint['export_time']
+        print(f"Resuming from checkpoint: {len(completed)} projects already collected")
+    # Rows of the projects collected since the last checkpoint, saved as the next segment
+    segment = StagingTable('checkpoint', None) if CHECKPOINT_URI else None
+    last_checkpoint = time.monotonic()
 
-        # Convert lifecycle state enum to string
-        lifecycle_state = project.state.name if hasattr(project.state, 'name') else str(project.state)
-        
-        # Format create time
-        create_time = project.create_time.strftime('%Y-%m-%d') if project.create_time else ''
+    def collect_or_resume(project):
+        if project.name in completed:
+            return None
+        return collect_project_tags(project)
+
+    # Tags are collected concurrently but returned in project order, so the output doesn't change,
+    # and each project is staged as soon as its turn comes
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        projects_tags = map_in_order(executor, collect_or_resume, projects, window=MAX_WORKERS * 4)
+        for i, (project, effective_tags) in enumerate(zip(projects, projects_tags)):
+            project_id = project.project_id
+            project_number = project.name.split('/')[-1]
+            project_display_name = project.display_name
+            print(f"Processing ({i+1}/{len(projects)}) {project_id}")
+
+            # Not exported (no project number or not ACTIVE), or already staged from the checkpoint
+            if effective_tags is None:
+                continue
+
+            # Convert lifecycle state enum to string
+            lifecycle_state = project.state.name if hasattr(project.state, 'name') else str(project.state)
+            
+            # Format create time
+            create_time = project.create_time.strftime('%Y-%m-%d') if project.create_time else ''
 
-        # Only process ACTIVE projects for BigQuery
-        if lifecycle_state == 'ACTIVE':
             # Process main project data
-            projects_data.append({
+            project_row = {
                 'project_id': project_id,
                 'project_number': project_number,
                 'project_name': project_display_name,
                 'lifecycle_state': lifecycle_state,
                 'create_time': create_time if create_time else None,
-                'export_date': export_date.isoformat(),
-                'export_time': export_time.isoformat(),
+                'export_date': export_date_str,
+                'export_time': export_time_str,
                 'tag_count': len(effective_tags)
-            })
+            }
+            projects_data.append(project_row)
             
             # Process tags data (normalized)
+            tag_rows = []
             for tag in effective_tags:
                 if ':' in tag:
                     key, value = tag.split(':', 1)
                 else:
                     key, value = tag, ''
                 
-                tags_data.append({
+                tag_row = {
                     'project_id': project_id,
                     'project_number': project_number,
                     'tag_key': key,
                     'tag_value': value,
                     'tag_full': tag,
-                    'export_date': export_date.isoformat()
-                })
+                    'export_date': export_date_str
+                }
+                tags_data.append(tag_row)
+                tag_rows.append(tag_row)
+
+            if segment is not None:
+                segment.append({'name': project.name, 'project': project_row, 'tags': tag_rows})
+                if time.monotonic() - last_checkpoint >= CHECKPOINT_INTERVAL_SECONDS:
+                    segments = save_progress(export_date, export_time_str, segment, segments)
+                    segment.close()
+                    segment = StagingTable('checkpoint', None)
+                    last_checkpoint = time.monotonic()
+
+    # Collection is complete, a retry after a failed upload only has to stage and upload again
+    if segment is not None:
+        save_progress(export_date, export_time_str, segment, segments, finished=True)
+        segment.close()
 
+    print(f"Resolved {len(folder_parent_cache)} folders and {len(container_tags_cache)} folder/organization tag sets")
     return projects_data, tags_data, len(projects)
 
+def load_staging(staging, table_name):
+    """Replace the content of a table (or of a partition decorator) with staged rows."""
+    # The staged file is uploaded as is, without loading the rows in memory
+    job = bq_client.load_table_from_file(
+        staging.finish(),
+        bq_client.dataset(BQ_DATASET).table(table_name),
+        job_config=bigquery.LoadJobConfig(
+            source_format=bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+            write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
+            schema=staging.schema
+        )
+    )
+    job.result()
+
+def load_partition(staging, export_date):
+    """Replace the export_date partition of a table with its staged rows (WRITE_TRUNCATE on the partition decorator)."""
+    partition = f"{staging.table_id}${export_date.strftime('%Y%m%d')}"
+
+    if not staging:
+        # Nothing to load: drop the partition so a re-run doesn't keep stale rows
+        bq_client.delete_table(bq_client.dataset(BQ_DATASET).table(partition), not_found_ok=True)
+        return
+
+    load_staging(staging, partition)
+
+def read_tag_intervals():
+    """Read the stored tag assignment intervals (dates as ISO strings)."""
+    table_ref = bq_client.dataset(BQ_DATASET).table(BQ_TABLE_TAG_INTERVALS)
+    for row in bq_client.list_rows(table_ref, selected_fields=create_tag_intervals_table_schema()):
+        interval = dict(row.items())
+        interval['valid_from'] = interval['valid_from'].isoformat()
+        interval['valid_to'] = interval['valid_to'].isoformat() if interval['valid_to'] else None
+        yield interval
+
+def upload_tag_intervals(tags_data, export_date):
+    """Close the intervals of the tags gone since the last run and open the new ones.
+
+    The intervals table only grows with tag changes, instead of a full copy of
+    every tag every day; it is small enough to be read with list_rows (no
+    query cost) and rewritten with a truncating load, without any DML.
+    """
+    create_table_if_not_exists(BQ_TABLE_TAG_INTERVALS, create_tag_intervals_table_schema())
+    create_view_if_not_exists(BQ_VIEW_CURRENT_TAGS, f"""
+        SELECT project_id, project_number, tag_key, tag_value, tag_full, valid_from
+        FROM `{BQ_PROJECT_ID}.{BQ_DATASET}.{BQ_TABLE_TAG_INTERVALS}`
+        WHERE valid_to IS NULL
+    """)
+
+    rows, opened, closed = diff_tag_intervals(read_tag_intervals(), tags_data, export_date.isoformat())
+    print(f"Tag intervals: {opened} opened, {closed} closed, {len(rows)} stored")
+    if not opened and not closed:
+        return
+
+    intervals = StagingTable(BQ_TABLE_TAG_INTERVALS, create_tag_intervals_table_schema())
+    try:
+        for row in rows:
+            intervals.append(row)
+        if intervals:
+            load_staging(intervals, BQ_TABLE_TAG_INTERVALS)
+        else:
+            # Every interval was undone by a same-day re-run
+            bq_client.delete_table(bq_client.dataset(BQ_DATASET).table(BQ_TABLE_TAG_INTERVALS))
+    finally:
+        intervals.close()
+
 def upload_to_bigquery(projects_data, tags_data):
-    """Upload data to BigQuery with 1-year retention."""
-    # Use Paris timezone to match scheduler timezone  
-    paris_tz = pytz.timezone('Europe/Paris')
-    export_time = datetime.now(timezone.utc)
-    export_time_paris = export_time.astimezone(paris_tz)
-    export_date = export_time_paris.date()
-    
+    """Upload the staged data to BigQuery, replacing the export date partition (retention by partition expiration)."""
     print("Creating BigQuery tables if needed...")
     
     # Create tables if they don't exist
@@ -265,11 +796,12 @@ def upload_to_bigquery(projects_data, tags_data):
         partition_field="export_date"
     )
     
-    create_table_if_not_exists(
-        BQ_TABLE_TAGS, 
-        create_tags_table_schema(), 
-        partition_field="export_date"
-    )
+    if TAG_EXPORT_MODE != 'intervals':
+        create_table_if_not_exists(
+            BQ_TABLE_TAGS, 
+            create_tags_table_schema(), 
+            partition_field="export_date"
+        )
     
     print(f"Found {len(projects_data)} active projects with {len(tags_data)} total tags")
     
@@ -277,66 +809,19 @@ def upload_to_bigquery(projects_data, tags_data):
         print("WARNING: No active projects found!")
         return
 
-    # Delete existing data for today (if re-running) and old data (>1 year)
-    print("Cleaning existing data for today and data older than 1 year...")
-    retention_date = export_date.replace(year=export_date.year - 1)
-    
-    for table_name in [BQ_TABLE_PROJECTS, BQ_TABLE_TAGS]:
-        # Delete today's data (for re-runs)
-        delete_today_query = f"""
-        DELETE FROM `{BQ_PROJECT_ID}.{BQ_DATASET}.{table_name}`
-        WHERE export_date = @export_date
-        """
-        
-        # Delete data older than 1 year
-        delete_old_query = f"""
-        DELETE FROM `{BQ_PROJECT_ID}.{BQ_DATASET}.{table_name}`
-        WHERE export_date < @retention_date
-        """
-        
-        job_config_today = bigquery.QueryJobConfig(
-            query_parameters=[
-                bigquery.ScalarQueryParameter("export_date", "DATE", export_date)
-            ]
-        )
-        job_config_old = bigquery.QueryJobConfig(
-            query_parameters=[
-                bigquery.ScalarQueryParameter("retention_date", "DATE", retention_date)
-            ]
-        )
-        
-        bq_client.query(delete_today_query, job_config=job_config_today).result()
-        old_data_job = bq_client.query(delete_old_query, job_config=job_config_old)
-        old_data_job.result()
-        
-        if old_data_job.num_dml_affected_rows > 0:
-            print(f"Deleted {old_data_job.num_dml_affected_rows} old records from {table_name}")
+    # Rows are loaded into the partition of the date they were collected on (Paris date, see collect_project_data),
+    # overwriting it, so re-running on the same day doesn't duplicate data
+    export_date = projects_data.export_date
 
     # Upload projects data
-    print("Uploading to BigQuery...")
-    projects_table_ref = bq_client.dataset(BQ_DATASET).table(BQ_TABLE_PROJECTS)
-    projects_job = bq_client.load_table_from_json(
-        projects_data, 
-        projects_table_ref,
-        job_config=bigquery.LoadJobConfig(
-            write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
-            schema=create_projects_table_schema()
-        )
-    )
-    projects_job.result()
+    print(f"Uploading to BigQuery partition {export_date.isoformat()}...")
+    load_partition(projects_data, export_date)
     
-    # Upload tags data
-    if tags_data:
-        tags_table_ref = bq_client.dataset(BQ_DATASET).table(BQ_TABLE_TAGS)
-        tags_job = bq_client.load_table_from_json(
-            tags_data,
-            tags_table_ref,
-            job_config=bigquery.LoadJobConfig(
-                write_disposition=bigquery.WriteDisposition.WRITE_APPEND,
-                schema=create_tags_table_schema()
-            )
-        )
-        tags_job.result()
+    # Upload tags data, as a daily snapshot or as changes to the assignment intervals
+    if TAG_EXPORT_MODE == 'intervals':
+        upload_tag_intervals(tags_data, export_date)
+    else:
+        load_partition(tags_data, export_date)
 
 def tags_to_bigquery_function(request):
     """Cloud Function entry point triggered by HTTP request from Cloud Scheduler."""
@@ -347,7 +832,16 @@ def tags_to_bigquery_function(request):
         projects_data, tags_data, total_projects = collect_project_data()
         
         # Upload to BigQuery
-        upload_to_bigquery(projects_data, tags_data)
+        try:
+            upload_to_bigquery(projects_data, tags_data)
+
+            # Uploaded: the next run of the day collects again from scratch
+            if CHECKPOINT_URI and projects_data:
+                delete_checkpoint(projects_data.export_date.isoformat())
+        finally:
+            # Cloud Functions' /tmp is memory-backed, don't keep the staging files on warm instances
+            projects_data.close()
+            tags_data.close()
         
         result = {
             "status": "success",
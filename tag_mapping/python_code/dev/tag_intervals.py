@@ -0,0 +1,74 @@
+"""
+Tag assignment intervals: the comparison between the stored intervals and today's tags.
+
+Pure functions without any GCP dependency, so they can be run offline
+against fixture snapshots.
+
+An interval row is a tag row (project_id, project_number, tag_key,
+tag_value, tag_full) with valid_from and valid_to ISO dates: the tag was
+assigned from valid_from (included) to valid_to (excluded), or is still
+assigned when valid_to is None.
+"""
+
+INTERVAL_FIELDS = ('project_id', 'project_number', 'tag_key', 'tag_value', 'tag_full')
+
+def interval_key(row):
+    """Identify a tag assignment: (project_id, tag_full)."""
+    return row['project_id'], row['tag_full']
+
+def diff_tag_intervals(intervals, current_tags, export_date):
+    """Apply today's tags to the stored intervals.
+
+    Tags that disappeared get their open interval closed at export_date, and
+    new tags get an interval opened at export_date; the other intervals are
+    kept as is. Running it again on the same day with different tags undoes
+    the previous run's changes of that day instead of creating zero-length
+    intervals, so re-runs stay idempotent.
+
+    Args:
+        intervals: Stored interval rows (dicts, ISO date strings).
+        current_tags: Tag rows collected today (dicts with INTERVAL_FIELDS).
+        export_date (str): Today's ISO date.
+
+    Returns:
+        (rows, opened, closed): every interval row to store, sorted by
+        project, tag and valid_from, and the number of intervals opened and
+        closed by today's tags.
+    """
+    current = {}
+    for row in current_tags:
+        current[interval_key(row)] = row
+
+    rows = []
+    still_assigned = set()
+    opened = closed = 0
+    # Open intervals first, so a same-day re-run only reopens an interval it closed itself
+    for interval in sorted(intervals, key=lambda row: row['valid_to'] is not None):
+        key = interval_key(interval)
+        if interval['valid_to'] is None:
+            if key in current:
+                still_assigned.add(key)
+                rows.append(interval)
+            elif interval['valid_from'] >= export_date:
+                # Opened earlier today, the tag is gone again
+                closed += 1
+            else:
+                rows.append(dict(interval, valid_to=export_date))
+                closed += 1
+        elif interval['valid_to'] == export_date and key in current and key not in still_assigned:
+            # Closed earlier today, the tag is back
+            still_assigned.add(key)
+            rows.append(dict(interval, valid_to=None))
+            opened += 1
+        else:
+            rows.append(interval)
+
+    for key, row in current.items():
+        if key not in still_assigned:
+            interval = {field: row[field] for field in INTERVAL_FIELDS}
+            interval.update(valid_from=export_date, valid_to=None)
+            rows.append(interval)
+            opened += 1
+
+    rows.sort(key=lambda row: (row['project_id'], row['tag_full'], row['valid_from']))
+    return rows, opened, closed
@@ -16,6 +16,7 @@ def dry_run_test():
     
     try:
         print("Collecting project data...")
+        # Rows are staged in temporary files, iterate them to read them back
         projects_data, tags_data, total_projects = collect_project_data()
         
         print(f"\n📊 RESULTS:")
@@ -26,18 +27,18 @@ def dry_run_test():
         # Show sample data
         if projects_data:
             print(f"\n📝 SAMPLE PROJECT DATA:")
-            print(json.dumps(projects_data[0], indent=2))
+            print(json.dumps(next(iter(projects_data)), indent=2))
         
         if tags_data:
             print(f"\n🏷️  SAMPLE TAG DATA:")
-            print(json.dumps(tags_data[0], indent=2))
+            print(json.dumps(next(iter(tags_data)), indent=2))
             
         # Save to files for inspection
         with open('dry_run_projects.json', 'w') as f:
-            json.dump(projects_data, f, indent=2)
+            json.dump(list(projects_data), f, indent=2)
             
         with open('dry_run_tags.json', 'w') as f:
-            json.dump(tags_data, f, indent=2)
+            json.dump(list(tags_data), f, indent=2)
             
         print(f"\n💾 Data saved to:")
         print(f"  - dry_run_projects.json")
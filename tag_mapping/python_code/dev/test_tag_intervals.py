@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Offline checks of the tag intervals comparison against fixture snapshots (no GCP access needed)
+"""
+import sys
+from tag_intervals import diff_tag_intervals
+
+def tag_row(project_id, tag_full):
+    """A tag row as collected by collect_project_data."""
+    key, value = tag_full.split(':', 1)
+    return {
+        'project_id': project_id,
+        'project_number': f"{sum(map(ord, project_id))}",
+        'tag_key': key,
+        'tag_value': value,
+        'tag_full': tag_full,
+        'export_date': '2025-08-20',
+    }
+
+# Fixture snapshots: the tags collected on each export date
+DAY_1 = [tag_row('prj-a', 'Environment:Production'), tag_row('prj-b', 'Environment:Staging')]
+DAY_2 = [tag_row('prj-a', 'Environment:Production'), tag_row('prj-b', 'Environment:Production')]
+
+def summary(rows):
+    """(project, tag, valid_from, valid_to) of every interval."""
+    return [(row['project_id'], row['tag_full'], row['valid_from'], row['valid_to']) for row in rows]
+
+def test_first_load():
+    """Every tag opens an interval."""
+    rows, opened, closed = diff_tag_intervals([], DAY_1, '2025-08-20')
+    assert (opened, closed) == (2, 0)
+    assert summary(rows) == [
+        ('prj-a', 'Environment:Production', '2025-08-20', None),
+        ('prj-b', 'Environment:Staging', '2025-08-20', None),
+    ]
+
+def test_tag_change():
+    """A changed tag closes the old interval and opens a new one, the others are kept."""
+    day_1, _, _ = diff_tag_intervals([], DAY_1, '2025-08-20')
+    rows, opened, closed = diff_tag_intervals(day_1, DAY_2, '2025-08-21')
+    assert (opened, closed) == (1, 1)
+    assert summary(rows) == [
+        ('prj-a', 'Environment:Production', '2025-08-20', None),
+        ('prj-b', 'Environment:Production', '2025-08-21', None),
+        ('prj-b', 'Environment:Staging', '2025-08-20', '2025-08-21'),
+    ]
+
+def test_same_day_rerun_undoing_change():
+    """A re-run of the day that no longer sees the change restores the previous intervals."""
+    day_1, _, _ = diff_tag_intervals([], DAY_1, '2025-08-20')
+    day_2, _, _ = diff_tag_intervals(day_1, DAY_2, '2025-08-21')
+    rows, opened, closed = diff_tag_intervals(day_2, DAY_1, '2025-08-21')
+    assert (opened, closed) == (1, 1)
+    assert rows == day_1
+
+def test_same_day_rerun_without_change():
+    """A re-run of the day with the same tags changes nothing."""
+    day_1, _, _ = diff_tag_intervals([], DAY_1, '2025-08-20')
+    day_2, _, _ = diff_tag_intervals(day_1, DAY_2, '2025-08-21')
+    rows, opened, closed = diff_tag_intervals(day_2, DAY_2, '2025-08-21')
+    assert (opened, closed) == (0, 0)
+    assert rows == day_2
+
+def test_tag_added_back_later():
+    """A tag assigned again on a later day gets a new interval, its closed one is kept."""
+    day_1, _, _ = diff_tag_intervals([], DAY_1, '2025-08-20')
+    day_2, _, _ = diff_tag_intervals(day_1, DAY_2, '2025-08-21')
+    rows, opened, closed = diff_tag_intervals(day_2, DAY_1, '2025-09-01')
+    assert (opened, closed) == (1, 1)
+    assert summary(rows) == [
+        ('prj-a', 'Environment:Production', '2025-08-20', None),
+        ('prj-b', 'Environment:Production', '2025-08-21', '2025-09-01'),
+        ('prj-b', 'Environment:Staging', '2025-08-20', '2025-08-21'),
+        ('prj-b', 'Environment:Staging', '2025-09-01', None),
+    ]
+
+if __name__ == "__main__":
+    tests = [test_first_load, test_tag_change, test_same_day_rerun_undoing_change,
+             test_same_day_rerun_without_change, test_tag_added_back_later]
+    failures = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ {test.__name__}")
+        except AssertionError as e:
+            failures += 1
+            print(f"❌ {test.__name__}: {e}")
+    sys.exit(1 if failures else 0)